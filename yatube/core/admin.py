@@ -0,0 +1,80 @@
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+# сколько самых частых стеков показывать на странице профиля
+TOP_STACKS = 30
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created', 'view_name', 'path', 'status',
+                    'duration_ms', 'samples', 'requested', 'user')
+    list_filter = ('view_name', 'requested')
+    search_fields = ('path',)
+    readonly_fields = ('created', 'view_name', 'path', 'method', 'status',
+                       'user', 'requested', 'duration_ms', 'samples',
+                       'download', 'top_stacks')
+    exclude = ('filename',)
+    empty_value_display = '-пусто-'
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:profile_id>/folded/',
+                 self.admin_site.admin_view(self.folded),
+                 name='core_requestprofile_folded'),
+        ] + super().get_urls()
+
+    def _file(self, profile):
+        # имя файла пишет только профилировщик, но из каталога
+        # всё равно не выходим
+        return os.path.join(settings.PROFILER_DIR,
+                            os.path.basename(profile.filename))
+
+    def folded(self, request, profile_id):
+        profile = get_object_or_404(RequestProfile, pk=profile_id)
+        try:
+            stacks = open(self._file(profile), 'rb')
+        except FileNotFoundError:
+            raise Http404('Файл профиля удалён')
+        return FileResponse(stacks, as_attachment=True,
+                            filename=os.path.basename(profile.filename),
+                            content_type='text/plain; charset=utf-8')
+
+    def download(self, profile):
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('admin:core_requestprofile_folded', args=[profile.pk]),
+            profile.filename,
+        )
+    download.short_description = 'Свёрнутые стеки'
+
+    def top_stacks(self, profile):
+        # строки файла уже отсортированы по убыванию числа отсчётов;
+        # лист стека - последний кадр
+        try:
+            with open(self._file(profile)) as stacks:
+                lines = list(islice(stacks, TOP_STACKS))
+        except FileNotFoundError:
+            return '-файл удалён-'
+        rows = []
+        for line in lines:
+            stack, count = line.rstrip('\n').rsplit(' ', 1)
+            rows.append(f'{count:>6}  {stack.rsplit(";", 1)[-1]}\n'
+                        f'        {stack}')
+        return format_html('<pre style="white-space: pre-wrap">{}</pre>',
+                           '\n'.join(rows))
+    top_stacks.short_description = 'Частые стеки'
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
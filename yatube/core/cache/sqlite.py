@@ -0,0 +1,214 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .. import instrumentation
+
+
+class SQLiteCache(BaseCache):
+    """кэш в файле SQLite в режиме WAL, общий для всех процессов
+    сервера на одной машине; целые числа хранятся как INTEGER,
+    поэтому incr - один атомарный UPDATE; при переполнении
+    вытесняются давно не читавшиеся ключи (приближённый LRU)"""
+
+    # время последнего чтения обновляется не чаще раза в секунду,
+    # чтобы каждый get не превращался в запись
+    ACCESS_GRANULARITY = 1.0
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5.0)
+        # число записей проверяется на каждой CULL_CHECK_EVERY-й вставке
+        self._cull_check_every = options.get('CULL_CHECK_EVERY', 100)
+        self._local = threading.local()
+        self._sets = 0
+
+    @property
+    def connection(self):
+        # своё соединение у каждого потока, как в django.db: транзакции
+        # BEGIN IMMEDIATE в incr и set_many на общем соединении
+        # сталкиваются; унаследованное через fork - не используется
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self._path,
+                                     timeout=self._busy_timeout,
+                                     isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB, '
+            'expires REAL, accessed REAL NOT NULL) WITHOUT ROWID'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS cache_accessed '
+                           'ON cache (accessed)')
+        return connection
+
+    def _encode(self, value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _decode(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self.connection.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            [*keys, now]
+        ).fetchall()
+
+        stale = [key for key, _, accessed in rows
+                 if now - accessed > self.ACCESS_GRANULARITY]
+        if stale:
+            self.connection.execute(
+                f'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({", ".join("?" * len(stale))})',
+                [now, *stale]
+            )
+        instrumentation.count('cache_hit', len(rows))
+        instrumentation.count('cache_miss', len(keys) - len(rows))
+        return {keys[key]: self._decode(value) for key, value, _ in rows}
+
+    def _write(self, mode, key, value, timeout, version):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        if mode == 'add':
+            # просроченный ключ не мешает add
+            self.connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                [key, now]
+            )
+            sql = 'INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?)'
+        else:
+            sql = 'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)'
+        cursor = self.connection.execute(
+            sql, [key, self._encode(value), expires, now]
+        )
+        self._sets += 1
+        if self._sets % self._cull_check_every == 0:
+            self._cull(now)
+        return cursor.rowcount > 0
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write('set', key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write('add', key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            for key, value in data.items():
+                self._write('set', key, value, timeout, version)
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [self.get_backend_timeout(timeout),
+             self._key(key, version), time.time()]
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = connection.execute(
+                "UPDATE cache SET value = value + ? WHERE key = ? "
+                "AND (expires IS NULL OR expires > ?) "
+                "AND typeof(value) = 'integer'",
+                [delta, key, time.time()]
+            )
+            if cursor.rowcount == 0:
+                raise ValueError("Key '%s' not found" % key)
+            value, = connection.execute(
+                'SELECT value FROM cache WHERE key = ?', [key]
+            ).fetchone()
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def delete(self, key, version=None):
+        self.connection.execute('DELETE FROM cache WHERE key = ?',
+                                [self._key(key, version)])
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            placeholders = ', '.join('?' * len(keys))
+            self.connection.execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders})', keys
+            )
+
+    def has_key(self, key, version=None):
+        return self.connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [self._key(key, version), time.time()]
+        ).fetchone() is not None
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def _cull(self, now):
+        """удаляет просроченные ключи, а при превышении MAX_ENTRIES -
+        долю 1/CULL_FREQUENCY давно не читавшихся"""
+        connection = self.connection
+        connection.execute('DELETE FROM cache WHERE expires <= ?', [now])
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            [count // self._cull_frequency]
+        )
+
+    def close(self, **kwargs):
+        # соединение переживает запрос, как и файл кэша
+        pass
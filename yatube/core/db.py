@@ -0,0 +1,16 @@
+"""настройки соединений SQLite для работы под нагрузкой"""
+from django.conf import settings
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(connection):
+    """PRAGMA из SQLITE_PRAGMAS для нового соединения; режим WAL
+    хранится в самом файле базы, остальное действует на соединение"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
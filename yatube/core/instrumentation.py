@@ -0,0 +1,99 @@
+"""счётчики производительности текущего запроса
+
+ServerTimingMiddleware заводит Metrics на время запроса, а места,
+которые стоит измерять (запросы к базе, отрисовка шаблонов, кэш,
+миниатюры), добавляют в них время и количество; вне запроса
+счётчиков нет и замеры ничего не стоят"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.template import base
+
+_local = threading.local()
+
+
+class Metrics:
+    __slots__ = ('durations', 'counts', 'depth')
+
+    def __init__(self):
+        # имя -> секунды и имя -> число событий
+        self.durations = {}
+        self.counts = {}
+        # вложенность отрисовки шаблонов: include и extends
+        # не должны учитываться повторно
+        self.depth = 0
+
+    def add(self, name, seconds, count=1):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    def count(self, name, count=1):
+        self.counts[name] = self.counts.get(name, 0) + count
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+def start():
+    _local.metrics = Metrics()
+    return _local.metrics
+
+
+def stop():
+    _local.metrics = None
+
+
+def count(name, value=1):
+    metrics = current()
+    if metrics is not None and value:
+        metrics.count(name, value)
+
+
+@contextmanager
+def timer(name):
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - started)
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """обёртка connection.execute_wrapper для всех запросов к базе"""
+    metrics = current()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add('db', time.perf_counter() - started)
+
+
+def _timed_render(render):
+    def timed_render(self, context):
+        metrics = current()
+        if metrics is None or metrics.depth:
+            return render(self, context)
+        metrics.depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.depth -= 1
+            metrics.add('template', time.perf_counter() - started)
+    timed_render.instrumented = True
+    return timed_render
+
+
+def install():
+    """подменяет Template.render один раз за процесс;
+    вызывается из CoreConfig.ready"""
+    if not getattr(base.Template.render, 'instrumented', False):
+        base.Template.render = _timed_render(base.Template.render)
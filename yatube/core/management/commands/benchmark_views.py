@@ -0,0 +1,291 @@
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from itertools import cycle
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (CaptureQueriesContext,
+                               setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from mixer.backend.django import mixer
+from PIL import Image
+
+from posts import counters
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+def percentile(values, share):
+    """значение по методу ближайшего ранга"""
+    ordered = sorted(values)
+    rank = max(1, round(share * len(ordered) + 0.5))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def jpeg(name, size=(1200, 800)):
+    image = Image.new('RGB', size, color=(random.randrange(256), 90, 160))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+def reset_peak():
+    """сброс пика tracemalloc; reset_peak() есть только с Python 3.9,
+    раньше пик сбрасывается перезапуском трассировки"""
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.stop()
+        tracemalloc.start()
+
+
+class Command(BaseCommand):
+    help = ('Замеряет вьюхи posts и users на тестовой базе с '
+            'сгенерированными данными: p50/p95/p99, запросы и память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--comments', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=200)
+        parser.add_argument('--images', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='запросов на каждый сценарий')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', help='файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        directory = tempfile.mkdtemp()
+        # отдельные база, кэш и MEDIA_ROOT: рабочие данные не трогаем
+        overrides = override_settings(
+            MEDIA_ROOT=f'{directory}/media',
+            CACHES={'default': {
+                'BACKEND': 'core.cache.sqlite.SQLiteCache',
+                'LOCATION': f'{directory}/cache.sqlite3',
+            }},
+        )
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(verbosity=0,
+                                                      autoclobber=True)
+        overrides.enable()
+        try:
+            dataset = self.seed(options)
+            results = self.run_scenarios(dataset, options)
+        finally:
+            overrides.disable()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(directory, ignore_errors=True)
+
+        self.report(results)
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump(self.document(results, options), output,
+                          ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты записаны в {options["json"]}')
+
+    def seed(self, options):
+        self.stdout.write('Генерация данных...')
+        users = mixer.cycle(options['users']).blend(
+            User, username=mixer.sequence('bench{0}')
+        )
+        groups = mixer.cycle(options['groups']).blend(
+            Group, slug=mixer.sequence('bench-group-{0}')
+        )
+        # mixer.cycle раздаёт значения только из генераторов
+        authors = (user for user in cycle(users))
+        group_choice = (group for group in cycle(groups + [None]))
+        posts = mixer.cycle(options['posts']).blend(
+            Post, author=authors, group=group_choice,
+            image='', image_widths='', comment_count=0,
+        )
+        for post in random.sample(posts, min(options['images'],
+                                             len(posts))):
+            post.image = jpeg(f'bench{post.id}.jpg')
+            post.save()
+        mixer.cycle(options['comments']).blend(
+            Comment, post=(random.choice(posts) for _ in iter(int, 1)),
+            author=(random.choice(users) for _ in iter(int, 1)),
+        )
+        pairs = {(random.choice(users), random.choice(users))
+                 for _ in range(options['follows'] * 2)}
+        for user, author in list(pairs)[:options['follows']]:
+            if user != author:
+                Follow.objects.get_or_create(user=user, author=author)
+        counters.reconcile_comments(list(Post.objects.values_list(
+            'id', flat=True)))
+        counters.reconcile_users(list(User.objects.values_list(
+            'id', flat=True)))
+
+        reader = (User.objects.filter(follower__isnull=False)
+                  .first() or users[0])
+        return {'users': users, 'groups': groups, 'posts': posts,
+                'reader': reader}
+
+    def scenarios(self, dataset):
+        """(название, клиент, функция -> (метод, адрес, данные))"""
+        posts = dataset['posts']
+        groups = dataset['groups']
+        users = dataset['users']
+        anonymous = Client()
+        reader = Client()
+        reader.force_login(dataset['reader'])
+        pages = max(1, len(posts) // settings.PAGINATOR_COUNT)
+        signups = iter(range(10 ** 9))
+
+        def index():
+            return 'get', reverse('posts:index'), {
+                'page': random.randint(1, pages)
+            }
+
+        def group_posts():
+            return 'get', reverse('posts:group_list',
+                                  args=[random.choice(groups).slug]), None
+
+        def profile():
+            return 'get', reverse('posts:profile',
+                                  args=[random.choice(users).username]), None
+
+        def post_detail():
+            return 'get', reverse('posts:post_detail',
+                                  args=[random.choice(posts).id]), None
+
+        def follow_index():
+            return 'get', reverse('posts:follow_index'), None
+
+        def post_create():
+            return 'post', reverse('posts:post_create'), {
+                'text': 'Benchmark post', 'group': random.choice(groups).id
+            }
+
+        def add_comment():
+            return 'post', reverse('posts:add_comment',
+                                   args=[random.choice(posts).id]), {
+                'text': 'Benchmark comment'
+            }
+
+        def signup():
+            number = next(signups)
+            return 'post', reverse('users:signup'), {
+                'username': f'signup{number}',
+                'email': f'signup{number}@example.com',
+                'password1': 'Bench-mark-123',
+                'password2': 'Bench-mark-123',
+            }
+
+        return [
+            ('index', reader, index),
+            ('index (anonymous)', anonymous, index),
+            ('group_posts', reader, group_posts),
+            ('group_posts (anonymous)', anonymous, group_posts),
+            ('profile', reader, profile),
+            ('profile (anonymous)', anonymous, profile),
+            ('post_detail', reader, post_detail),
+            ('post_detail (anonymous)', anonymous, post_detail),
+            ('follow_index', reader, follow_index),
+            ('post_create', reader, post_create),
+            ('add_comment', reader, add_comment),
+            ('signup', anonymous, signup),
+        ]
+
+    def request(self, client, make_request):
+        method, url, data = make_request()
+        response = getattr(client, method)(url, data)
+        # удачная отправка формы заканчивается редиректом
+        if (response.status_code >= 400
+                or method == 'post' and response.status_code != 302):
+            raise RuntimeError(f'{method.upper()} {url}: '
+                               f'{response.status_code}')
+
+    def run_scenarios(self, dataset, options):
+        results = {}
+        for name, client, make_request in self.scenarios(dataset):
+            for _ in range(options['warmup']):
+                self.request(client, make_request)
+
+            timings, queries = [], []
+            for _ in range(options['requests']):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    self.request(client, make_request)
+                    timings.append(time.perf_counter() - started)
+                queries.append(len(captured))
+
+            # память отдельным проходом: tracemalloc замедляет запросы
+            allocated = []
+            tracemalloc.start()
+            try:
+                for _ in range(min(options['requests'], 10)):
+                    reset_peak()
+                    baseline, _ = tracemalloc.get_traced_memory()
+                    self.request(client, make_request)
+                    _, peak = tracemalloc.get_traced_memory()
+                    allocated.append(peak - baseline)
+            finally:
+                tracemalloc.stop()
+
+            results[name] = {
+                'requests': len(timings),
+                'p50_ms': percentile(timings, 0.50) * 1000,
+                'p95_ms': percentile(timings, 0.95) * 1000,
+                'p99_ms': percentile(timings, 0.99) * 1000,
+                'mean_ms': statistics.mean(timings) * 1000,
+                'queries_median': statistics.median(queries),
+                'queries_max': max(queries),
+                'peak_kib_median': statistics.median(allocated) / 1024,
+            }
+            cache.clear()
+        return results
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"view":<26} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"queries":>8} {"peak KiB":>9}'
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f'{name:<26} {row["p50_ms"]:>8.2f} {row["p95_ms"]:>8.2f} '
+                f'{row["p99_ms"]:>8.2f} {row["queries_median"]:>8g} '
+                f'{row["peak_kib_median"]:>9.1f}'
+            )
+
+    def document(self, results, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True,
+                text=True, cwd=settings.BASE_DIR, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': {key: options[key] for key in (
+                'users', 'groups', 'posts', 'comments', 'follows',
+                'images', 'requests', 'warmup', 'seed'
+            )},
+            'results': results,
+        }
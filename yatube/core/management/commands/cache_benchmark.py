@@ -0,0 +1,84 @@
+import multiprocessing
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache.sqlite import SQLiteCache
+
+
+def _hammer(factory, operations):
+    cache = factory()
+    for _ in range(operations):
+        cache.incr('counter')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает бэкенды кэша: locmem, filebased и sqlite '
+            '(операции в секунду и согласованность между процессами)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=2000)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def backends(self, directory):
+        params = {'OPTIONS': {'MAX_ENTRIES': 1000000}}
+        return {
+            'locmem': lambda: LocMemCache('benchmark', params),
+            'filebased': lambda: FileBasedCache(f'{directory}/files', params),
+            'sqlite': lambda: SQLiteCache(f'{directory}/cache.sqlite3',
+                                          params),
+        }
+
+    def measure(self, function, operations):
+        started = time.perf_counter()
+        function()
+        return operations / (time.perf_counter() - started)
+
+    def handle(self, *args, **options):
+        operations = options['operations']
+        processes = options['processes']
+        value = {'page': 'x' * 2048}
+
+        self.stdout.write(
+            f'{"backend":<10} {"set/s":>10} {"get/s":>10} {"incr/s":>10} '
+            f'{"shared incr":>12}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, factory in self.backends(directory).items():
+                cache = factory()
+                keys = [f'key{i}' for i in range(operations)]
+                cache.set('counter', 0, None)
+
+                set_rate = self.measure(
+                    lambda: [cache.set(key, value) for key in keys],
+                    operations
+                )
+                get_rate = self.measure(
+                    lambda: [cache.get(key) for key in keys], operations
+                )
+                incr_rate = self.measure(
+                    lambda: [cache.incr('counter') for _ in keys],
+                    operations
+                )
+
+                # incr из нескольких процессов: итог виден всем
+                # и не теряет обновлений только у общего кэша
+                cache.set('counter', 0, None)
+                workers = [
+                    multiprocessing.Process(target=_hammer,
+                                            args=(factory, operations))
+                    for _ in range(processes)
+                ]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                shared = f'{cache.get("counter")}/{operations * processes}'
+
+                self.stdout.write(
+                    f'{name:<10} {set_rate:>10.0f} {get_rate:>10.0f} '
+                    f'{incr_rate:>10.0f} {shared:>12}'
+                )
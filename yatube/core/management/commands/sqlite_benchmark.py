@@ -0,0 +1,180 @@
+import multiprocessing
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import apply_pragmas
+
+from .benchmark_views import percentile
+
+SCHEMA = '''
+CREATE TABLE auth_user (id INTEGER PRIMARY KEY, username TEXT);
+CREATE TABLE posts_post (
+    id INTEGER PRIMARY KEY, text TEXT, pub_date REAL,
+    author_id INTEGER, comment_count INTEGER DEFAULT 0);
+CREATE INDEX post_pub_date_idx ON posts_post (pub_date DESC);
+CREATE TABLE posts_comment (
+    id INTEGER PRIMARY KEY, post_id INTEGER, author_id INTEGER,
+    text TEXT, created REAL);
+CREATE INDEX comment_post_created_idx
+    ON posts_comment (post_id, created);
+'''
+
+# страница главной: посты с авторами и число записей
+READ = (
+    'SELECT p.id, p.text, p.pub_date, p.comment_count, u.username '
+    'FROM posts_post p JOIN auth_user u ON u.id = p.author_id '
+    'ORDER BY p.pub_date DESC LIMIT 10 OFFSET ?'
+)
+COUNT = 'SELECT COUNT(*) FROM posts_post'
+
+
+def _connect(path, profile):
+    connection = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+    if profile == 'tuned':
+        apply_pragmas(connection.cursor(), settings.SQLITE_PRAGMAS)
+    return connection
+
+
+def _read(connection, posts):
+    connection.execute(COUNT).fetchone()
+    connection.execute(READ, [random.randrange(posts)]).fetchall()
+
+
+def _write(connection, posts, users):
+    # post_create или add_comment со счётчиком, одной транзакцией
+    connection.execute('BEGIN')
+    if random.random() < 0.5:
+        connection.execute(
+            'INSERT INTO posts_post (text, pub_date, author_id) '
+            'VALUES (?, ?, ?)',
+            ['Benchmark post', time.time(), random.randint(1, users)]
+        )
+    else:
+        post_id = random.randint(1, posts)
+        connection.execute(
+            'INSERT INTO posts_comment (post_id, author_id, text, created) '
+            'VALUES (?, ?, ?, ?)',
+            [post_id, random.randint(1, users), 'Benchmark', time.time()]
+        )
+        connection.execute('UPDATE posts_post SET comment_count = '
+                           'comment_count + 1 WHERE id = ?', [post_id])
+    connection.execute('COMMIT')
+
+
+def _worker(path, profile, role, options, start, results):
+    """крутит запросы одной роли до deadline; в профиле baseline
+    каждый запрос открывает новое соединение, в tuned соединение
+    одно на процесс"""
+    random.seed()
+    persistent = _connect(path, profile) if profile == 'tuned' else None
+    timings, errors = [], 0
+    # все процессы стартуют одновременно
+    time.sleep(max(0, start - time.time()))
+    deadline = start + options['duration']
+    while time.time() < deadline:
+        started = time.perf_counter()
+        connection = persistent or _connect(path, profile)
+        try:
+            if role == 'reader':
+                _read(connection, options['posts'])
+            else:
+                _write(connection, options['posts'], options['users'])
+        except sqlite3.OperationalError:
+            # "database is locked": запрос не выполнен
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+        else:
+            timings.append(time.perf_counter() - started)
+        finally:
+            if persistent is None:
+                connection.close()
+    results.put((role, timings, errors))
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест SQLite: параллельные читатели и писатели '
+            'с настройками по умолчанию и с SQLITE_PRAGMAS '
+            'и постоянными соединениями')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=6)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0,
+                            help='секунд на профиль')
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=10000)
+
+    def seed(self, path, options):
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.executescript(SCHEMA)
+        connection.execute('BEGIN')
+        connection.executemany(
+            'INSERT INTO auth_user (id, username) VALUES (?, ?)',
+            ((i, f'user{i}') for i in range(1, options['users'] + 1))
+        )
+        now = time.time()
+        connection.executemany(
+            'INSERT INTO posts_post (text, pub_date, author_id) '
+            'VALUES (?, ?, ?)',
+            ((f'Post {i}', now - i, i % options['users'] + 1)
+             for i in range(options['posts']))
+        )
+        connection.execute('COMMIT')
+        connection.close()
+
+    def run_profile(self, profile, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/benchmark.sqlite3'
+            self.seed(path, options)
+            results = multiprocessing.Queue()
+            start = time.time() + 0.5
+            roles = (['reader'] * options['readers']
+                     + ['writer'] * options['writers'])
+            workers = [
+                multiprocessing.Process(
+                    target=_worker,
+                    args=(path, profile, role, options, start, results)
+                )
+                for role in roles
+            ]
+            for worker in workers:
+                worker.start()
+            collected = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+
+        rows = {}
+        for role in ('reader', 'writer'):
+            timings = [timing for name, values, _ in collected
+                       if name == role for timing in values]
+            errors = sum(count for name, _, count in collected
+                         if name == role)
+            rows[role] = {
+                'per_second': len(timings) / options['duration'],
+                'p95_ms': (percentile(timings, 0.95) * 1000
+                           if timings else 0),
+                'errors': errors,
+            }
+        return rows
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{options["readers"]} читателей, {options["writers"]} '
+            f'писателей, {options["duration"]:g} с на профиль'
+        )
+        self.stdout.write(
+            f'{"profile":<10} {"role":<8} {"ops/s":>10} {"p95 ms":>8} '
+            f'{"errors":>7}'
+        )
+        for profile in ('baseline', 'tuned'):
+            for role, row in self.run_profile(profile, options).items():
+                self.stdout.write(
+                    f'{profile:<10} {role:<8} {row["per_second"]:>10.0f} '
+                    f'{row["p95_ms"]:>8.2f} {row["errors"]:>7}'
+                )
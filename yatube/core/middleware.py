@@ -0,0 +1,211 @@
+import logging
+import mimetypes
+import os
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from . import instrumentation, profiler
+from .models import RequestProfile
+
+logger = logging.getLogger('yatube.requests')
+
+
+class ServerTimingMiddleware:
+    """замеряет запрос: база, шаблоны, кэш и миниатюры попадают
+    в заголовок Server-Timing и в строку лога с именем вьюхи"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = instrumentation.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(
+                        instrumentation.db_wrapper
+                    ))
+                response = self.get_response(request)
+        finally:
+            instrumentation.stop()
+        total = time.perf_counter() - started
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = self.header(metrics, total)
+        self.log(request, response, metrics, total)
+        return response
+
+    def header(self, metrics, total):
+        durations, counts = metrics.durations, metrics.counts
+        parts = []
+        if 'db' in counts:
+            parts.append(f'db;dur={durations["db"] * 1000:.1f};'
+                         f'desc="{counts["db"]} queries"')
+        if 'template' in counts:
+            parts.append(f'template;dur={durations["template"] * 1000:.1f}')
+        if 'cache_hit' in counts or 'cache_miss' in counts:
+            parts.append(f'cache;desc="hit={counts.get("cache_hit", 0)} '
+                         f'miss={counts.get("cache_miss", 0)}"')
+        if 'thumbnail' in counts:
+            parts.append(f'thumbnail;dur={durations["thumbnail"] * 1000:.1f};'
+                         f'desc="{counts["thumbnail"]}"')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+    def log(self, request, response, metrics, total):
+        # медленные запросы видны и при уровне WARNING
+        level = (logging.WARNING
+                 if total * 1000 >= settings.SLOW_REQUEST_MS
+                 else logging.INFO)
+        if not logger.isEnabledFor(level):
+            return
+        match = request.resolver_match
+        durations, counts = metrics.durations, metrics.counts
+        fields = {
+            'view': match.view_name if match else '-',
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(durations.get('db', 0) * 1000, 2),
+            'db_queries': counts.get('db', 0),
+            'template_ms': round(durations.get('template', 0) * 1000, 2),
+            'cache_hits': counts.get('cache_hit', 0),
+            'cache_misses': counts.get('cache_miss', 0),
+            'thumbnail_ms': round(durations.get('thumbnail', 0) * 1000, 2),
+            'thumbnails': counts.get('thumbnail', 0),
+        }
+        logger.log(level,
+                   ' '.join(f'{key}={value}' for key, value in fields.items()),
+                   extra={'performance': fields})
+
+
+class ProfilerMiddleware:
+    """профилирует вьюху и отрисовку шаблона: сотрудник включает
+    профилировщик заголовком X-Profile или параметром __profile,
+    кроме того, доля PROFILER_SAMPLE_RATE запросов профилируется
+    случайно; результаты видны в админке"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # request.user ленивый: сессию читаем только при флаге
+        requested = (('HTTP_X_PROFILE' in request.META
+                      or '__profile' in request.GET)
+                     and request.user.is_staff)
+        if not requested and not (
+                settings.PROFILER_SAMPLE_RATE
+                and random.random() < settings.PROFILER_SAMPLE_RATE):
+            return self.get_response(request)
+
+        with profiler.Sampler(settings.PROFILER_INTERVAL) as sampler:
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match else '-'
+        RequestProfile.objects.create(
+            view_name=view_name,
+            path=request.get_full_path()[:2000],
+            method=request.method,
+            status=response.status_code,
+            user=request.user if request.user.is_authenticated else None,
+            requested=requested,
+            duration_ms=round(sampler.duration * 1000, 2),
+            samples=sampler.samples,
+            filename=profiler.save(sampler, view_name),
+        )
+        return response
+
+
+def accepted_encodings(header):
+    """кодировки из Accept-Encoding, кроме отключённых через q=0"""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip().partition('=')[2].strip()
+        if coding and quality not in ('0', '0.0', '0.00', '0.000'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """раздаёт STATIC_ROOT без внешнего веб-сервера: сжатая копия
+    выбирается по Accept-Encoding (Vary: Accept-Encoding), файлы
+    с хэшем в имени кэшируются на год как immutable, остальные -
+    на STATIC_MAX_AGE с проверкой по ETag"""
+    # предпочтительная кодировка первой
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        if not settings.STATIC_SERVE or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self._hashed = None
+
+    def hashed(self):
+        # имена с хэшем - значения манифеста collectstatic
+        if self._hashed is None:
+            self._hashed = set(
+                getattr(staticfiles_storage, 'hashed_files', {}).values()
+            )
+        return self._hashed
+
+    def __call__(self, request):
+        path = request.path_info
+        if (request.method not in ('GET', 'HEAD')
+                or not path.startswith(settings.STATIC_URL)):
+            return self.get_response(request)
+        name = path[len(settings.STATIC_URL):]
+        try:
+            original = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return self.get_response(request)
+        if not os.path.isfile(original):
+            return self.get_response(request)
+        return self.serve(request, name, original)
+
+    def serve(self, request, name, original):
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        served, encoding, compressed = original, None, False
+        for coding, suffix in self.ENCODINGS:
+            if os.path.isfile(original + suffix):
+                compressed = True
+                if encoding is None and coding in accepted:
+                    served, encoding = original + suffix, coding
+
+        stat = os.stat(served)
+        etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+        modified = int(os.stat(original).st_mtime)
+        response = get_conditional_response(request, etag=etag,
+                                            last_modified=modified)
+        if response is None:
+            content_type, _ = mimetypes.guess_type(original)
+            content_type = content_type or 'application/octet-stream'
+            response = FileResponse(open(served, 'rb'))
+            # FileResponse Django 2.2 угадывает тип text/html заново по
+            # имени открытого файла: a.html.gz стал бы application/gzip
+            response['Content-Type'] = content_type
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        if name in self.hashed():
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = (f'public, '
+                                         f'max-age={settings.STATIC_MAX_AGE}')
+        if compressed:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
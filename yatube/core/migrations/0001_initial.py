@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('view_name', models.CharField(max_length=200, verbose_name='Вьюха')),
+                ('path', models.CharField(max_length=2000, verbose_name='Адрес')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('requested', models.BooleanField(verbose_name='По запросу')),
+                ('duration_ms', models.FloatField(verbose_name='Время, мс')),
+                ('samples', models.PositiveIntegerField(verbose_name='Отсчётов')),
+                ('filename', models.CharField(max_length=255, verbose_name='Файл')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class RequestProfile(models.Model):
+    """профиль одного запроса; стеки лежат в файле PROFILER_DIR"""
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Дата')
+    view_name = models.CharField(max_length=200, verbose_name='Вьюха')
+    path = models.CharField(max_length=2000, verbose_name='Адрес')
+    method = models.CharField(max_length=10, verbose_name='Метод')
+    status = models.PositiveSmallIntegerField(verbose_name='Код ответа')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    # True - включён вручную, False - попал в случайную выборку
+    requested = models.BooleanField(verbose_name='По запросу')
+    duration_ms = models.FloatField(verbose_name='Время, мс')
+    samples = models.PositiveIntegerField(verbose_name='Отсчётов')
+    filename = models.CharField(max_length=255, verbose_name='Файл')
+
+    class Meta:
+        verbose_name_plural = 'Профили запросов'
+        verbose_name = 'Профиль запроса'
+        ordering = ['-created']
+
+    def __str__(self):
+        return f'{self.view_name} {self.created:%Y-%m-%d %H:%M:%S}'
@@ -0,0 +1,83 @@
+"""выборочный профилировщик запросов
+
+фоновый поток раз в PROFILER_INTERVAL снимает стек потока,
+обрабатывающего запрос, и считает одинаковые стеки; результат
+пишется в PROFILER_DIR в свёрнутом формате flamegraph.pl /
+speedscope: "кадр;кадр;кадр число" на строку"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+
+
+def _frame_name(code):
+    filename = code.co_filename
+    for prefix in (settings.BASE_DIR + os.sep, 'site-packages' + os.sep):
+        position = filename.find(prefix)
+        if position != -1:
+            filename = filename[position + len(prefix):]
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class Sampler:
+    """снимает стеки потока thread_id, пока работает контекст"""
+
+    def __init__(self, interval, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._names = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='request-sampler')
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            self.stacks[self._fold(frame)] += 1
+
+    def _fold(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            name = self._names.get(code)
+            if name is None:
+                name = self._names[code] = _frame_name(code)
+            names.append(name)
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n'
+                       for stack, count in self.stacks.most_common())
+
+
+def save(sampler, label):
+    """пишет свёрнутые стеки в PROFILER_DIR, возвращает имя файла"""
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    name = (f'{time.strftime("%Y%m%d-%H%M%S")}-'
+            f'{label.replace(":", "-")}-{uuid.uuid4().hex[:8]}.folded')
+    with open(os.path.join(settings.PROFILER_DIR, name), 'w') as output:
+        output.write(sampler.folded())
+    return name
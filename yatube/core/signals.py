@@ -0,0 +1,9 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import db
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    db.configure_connection(connection)
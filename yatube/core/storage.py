@@ -0,0 +1,72 @@
+"""статика с хэшем содержимого в имени и сжатыми копиями
+
+collectstatic пишет рядом с каждым текстовым файлом .gz (и .br, если
+установлен пакет brotli); StaticFilesMiddleware отдаёт сжатую копию
+по Accept-Encoding, а файлы с хэшем в имени - с кэшем на год"""
+import gzip
+from io import BytesIO
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# двоичные форматы (картинки, шрифты woff2) уже сжаты
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.txt', '.json', '.xml',
+                '.html', '.ico', '.ttf', '.eot', '.otf')
+# сжатая копия не пишется, если выигрыш меньше 5%
+MIN_RATIO = 0.95
+
+
+def gzip_compress(data):
+    """gzip с нулевым временем в заголовке: повторный collectstatic
+    даёт те же байты (gzip.compress принимает mtime только с 3.8)"""
+    buffer = BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9,
+                       mtime=0) as archive:
+        archive.write(data)
+    return buffer.getvalue()
+
+
+def encoders():
+    """расширение сжатой копии -> функция сжатия"""
+    available = {'.gz': gzip_compress}
+    if brotli is not None:
+        available['.br'] = brotli.compress
+    return available
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        # файла нет среди собранных (collectstatic не запускался или
+        # исходника нет в репозитории) - ссылка без хэша вместо
+        # ошибки на каждой странице
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        for suffix, function in encoders().items():
+            compressed = function(data)
+            if len(compressed) >= len(data) * MIN_RATIO:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
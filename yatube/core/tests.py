@@ -1,5 +1,29 @@
+import gzip
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
 from http import HTTPStatus
-from django.test import TestCase
+
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+from . import instrumentation, profiler
+from .cache.sqlite import SQLiteCache
+from .models import RequestProfile
+from .storage import brotli
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -7,3 +31,452 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+def incr_in_process(path, count):
+    cache = SQLiteCache(path, {})
+    for _ in range(count):
+        cache.incr('shared')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = f'{self.directory.name}/cache.sqlite3'
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_basic_operations(self):
+        """set/get/add/delete и типы значений"""
+        self.cache.set('dict', {'a': 1})
+        self.cache.set('int', 5)
+        self.cache.set('flag', True)
+        self.assertEqual(self.cache.get('dict'), {'a': 1})
+        self.assertIs(self.cache.get('flag'), True)
+        self.assertEqual(self.cache.get_many(['int', 'missing']), {'int': 5})
+
+        self.assertFalse(self.cache.add('int', 6))
+        self.assertTrue(self.cache.add('new', 6))
+        self.cache.delete('new')
+        self.assertIsNone(self.cache.get('new'))
+
+        self.assertEqual(self.cache.incr('int', 2), 7)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expiry(self):
+        """просроченные ключи не читаются и не мешают add"""
+        self.cache.set('short', 'value', 0.05)
+        self.assertEqual(self.cache.get('short'), 'value')
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 'again'))
+
+    def test_lru_cull(self):
+        """при переполнении вытесняются давно не читавшиеся ключи"""
+        cache = SQLiteCache(self.path, {'OPTIONS': {
+            'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2, 'CULL_CHECK_EVERY': 1,
+        }})
+        cache.ACCESS_GRANULARITY = 0
+        for i in range(10):
+            cache.set(f'key{i}', i)
+        cache.get('key0')
+        cache.set('overflow', 1)
+
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertLessEqual(
+            cache.connection.execute('SELECT COUNT(*) FROM cache')
+            .fetchone()[0], 10
+        )
+
+    def test_incr_from_threads(self):
+        """у каждого потока своё соединение: транзакции incr
+        не сталкиваются, ни одно увеличение не теряется"""
+        self.cache.set('threaded', 0, None)
+        errors = []
+
+        def work():
+            for _ in range(200):
+                try:
+                    self.cache.incr('threaded')
+                except Exception as error:
+                    errors.append(error)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.cache.get('threaded'), 1600)
+
+    def test_shared_between_processes(self):
+        """incr из нескольких процессов атомарен и виден всем"""
+        self.cache.set('shared', 0, None)
+        workers = [
+            multiprocessing.Process(target=incr_in_process,
+                                    args=(self.path, 50))
+            for _ in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('shared'), 150)
+
+
+class SQLitePragmaTests(TestCase):
+    def test_pragmas_applied(self):
+        """новое соединение получает SQLITE_PRAGMAS"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            # 1 - NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_wal_on_file(self):
+        """база в файле переходит в режим WAL"""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = connections[DEFAULT_DB_ALIAS].__class__(
+                {**connections[DEFAULT_DB_ALIAS].settings_dict,
+                 'NAME': f'{directory}/wal.sqlite3'},
+                alias='wal',
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+            finally:
+                wrapper.close()
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+PROFILER_DIR = tempfile.mkdtemp()
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        author = User.objects.create_user(username='TimedAuthor')
+        Post.objects.create(text='Timed post', author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_header(self):
+        """заголовок содержит базу, шаблоны, кэш и общее время"""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'template;dur=', 'cache;desc="hit=',
+                       'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+
+    def test_log_line(self):
+        """строка лога помечена именем вьюхи и считает запросы"""
+        with self.assertLogs('yatube.requests', 'INFO') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('posts:index'))
+        record, = logs.records
+        self.assertEqual(record.performance['view'], 'posts:index')
+        self.assertEqual(record.performance['status'], HTTPStatus.OK)
+        self.assertEqual(record.performance['db_queries'], len(queries))
+        self.assertIn('view=posts:index ', record.getMessage())
+
+    def test_cache_counted(self):
+        """повторный запрос читает страницу из кэша"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        with self.assertLogs('yatube.requests', 'INFO') as logs:
+            self.client.get(url)
+        self.assertGreater(logs.records[0].performance['cache_hits'], 0)
+
+    def test_outside_request(self):
+        """вне запроса замеры не накапливаются"""
+        with instrumentation.timer('template'):
+            pass
+        instrumentation.count('cache_hit')
+        self.assertIsNone(instrumentation.current())
+
+
+@override_settings(PROFILER_DIR=PROFILER_DIR, PROFILER_INTERVAL=0.001,
+                   PROFILER_SAMPLE_RATE=0)
+class ProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.staff = User.objects.create_user(username='Profiler',
+                                             is_staff=True)
+        cls.reader = User.objects.create_user(username='NotProfiler')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILER_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.staff)
+
+    def test_sampler_folded(self):
+        """стеки сворачиваются от корня к листу с числом отсчётов"""
+        with profiler.Sampler(0.001) as sampler:
+            busy(0.05)
+        self.assertGreater(sampler.samples, 0)
+        lines = sampler.folded().splitlines()
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertTrue(count.isdigit())
+        self.assertIn('busy (core/tests.py:', stack.split(';')[-1])
+
+    def test_staff_opt_in(self):
+        """сотрудник включает профилировщик заголовком или параметром"""
+        url = reverse('posts:index')
+        self.client.get(url, HTTP_X_PROFILE='1')
+        self.client.get(url, {'__profile': ''})
+        self.client.get(url)
+        profiles = RequestProfile.objects.all()
+        self.assertEqual(len(profiles), 2)
+        for profile in profiles:
+            with self.subTest(profile=profile):
+                self.assertEqual(profile.view_name, 'posts:index')
+                self.assertTrue(profile.requested)
+                self.assertEqual(profile.user, self.staff)
+                self.assertTrue(os.path.exists(
+                    os.path.join(PROFILER_DIR, profile.filename)
+                ))
+
+    def test_not_staff(self):
+        """обычный пользователь профилировщик не включает"""
+        self.client.force_login(self.reader)
+        self.client.get(reverse('posts:index'), HTTP_X_PROFILE='1')
+        self.client.logout()
+        self.client.get(reverse('posts:index'), {'__profile': ''})
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILER_SAMPLE_RATE=1)
+    def test_random_sampling(self):
+        """случайная выборка профилирует и анонимные запросы"""
+        self.client.logout()
+        self.client.get(reverse('about:author'))
+        profile = RequestProfile.objects.get()
+        self.assertFalse(profile.requested)
+        self.assertIsNone(profile.user)
+
+    def test_admin(self):
+        """профиль виден в админке вместе с частыми стеками"""
+        self.staff.is_superuser = True
+        self.staff.save()
+        self.client.get(reverse('posts:index'), HTTP_X_PROFILE='1')
+        profile = RequestProfile.objects.get()
+        response = self.client.get(reverse(
+            'admin:core_requestprofile_change', args=[profile.pk]
+        ))
+        self.assertContains(response, 'Частые стеки')
+        response = self.client.get(reverse(
+            'admin:core_requestprofile_folded', args=[profile.pk]
+        ))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+STATIC_DIRECTORY = tempfile.mkdtemp()
+CSS = ('body { background: url("../img/logo.png"); }\n'
+       + '.rule { color: #123456; margin: 0 auto; }\n' * 200)
+
+
+@override_settings(
+    STATICFILES_DIRS=[f'{STATIC_DIRECTORY}/source'],
+    STATIC_ROOT=f'{STATIC_DIRECTORY}/root',
+    STATICFILES_FINDERS=[
+        'django.contrib.staticfiles.finders.FileSystemFinder',
+    ],
+    STATICFILES_STORAGE='core.storage.CompressedManifestStaticFilesStorage',
+)
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(f'{STATIC_DIRECTORY}/source/css')
+        os.makedirs(f'{STATIC_DIRECTORY}/source/img')
+        with open(f'{STATIC_DIRECTORY}/source/css/site.css', 'w') as css:
+            css.write(CSS)
+        with open(f'{STATIC_DIRECTORY}/source/img/logo.png', 'wb') as png:
+            png.write(b'\x89PNG\r\n\x1a\n' + bytes(64))
+        with open(f'{STATIC_DIRECTORY}/source/offline.html', 'w') as html:
+            html.write('<!doctype html><p>Нет соединения</p>\n' * 50)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(STATIC_DIRECTORY, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = staticfiles_storage.stored_name('css/site.css')
+
+    def test_collectstatic(self):
+        """имена с хэшем, сжатые копии только у текстовых файлов"""
+        root = f'{STATIC_DIRECTORY}/root'
+        self.assertRegex(self.hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        with open(f'{root}/{self.hashed}', 'rb') as css, \
+                open(f'{root}/{self.hashed}.gz', 'rb') as compressed:
+            first = compressed.read()
+            self.assertEqual(gzip.decompress(first), css.read())
+        # повторная сборка даёт те же байты
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(f'{root}/{self.hashed}.gz', 'rb') as compressed:
+            self.assertEqual(compressed.read(), first)
+        self.assertEqual(os.path.exists(f'{root}/{self.hashed}.br'),
+                         brotli is not None)
+        self.assertFalse(any(name.endswith('.gz')
+                             for name in os.listdir(f'{root}/img')))
+        # ссылка на картинку в CSS тоже с хэшем
+        with open(f'{root}/{self.hashed}') as css:
+            self.assertRegex(css.read(), r'img/logo\.[0-9a-f]{12}\.png')
+        self.assertEqual(staticfiles_storage.stored_name('img/missing.png'),
+                         'img/missing.png')
+
+    def test_serve_hashed(self):
+        """файл с хэшем: сжатая копия по Accept-Encoding и кэш на год"""
+        url = f'/static/{self.hashed}'
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        body = b''.join(response.streaming_content)
+        self.assertIn(b'.rule', gzip.decompress(body))
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_serve_compressed_html(self):
+        """сжатая копия HTML отдаётся с типом text/html"""
+        name = staticfiles_storage.stored_name('offline.html')
+        for url in (f'/static/{name}', '/static/offline.html'):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertEqual(response['Content-Type'], 'text/html')
+                body = b''.join(response.streaming_content)
+                self.assertIn('Нет соединения'.encode(),
+                              gzip.decompress(body))
+
+    def test_serve_revalidated(self):
+        """файл без хэша кэшируется ненадолго и проверяется по ETag"""
+        response = self.client.get('/static/css/site.css')
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response = self.client.get('/static/css/site.css',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_outside_root(self):
+        """пути вне STATIC_ROOT не отдаются"""
+        response = self.client.get('/static/../manage.py')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+MEDIA_DIRECTORY = tempfile.mkdtemp()
+IMAGE = bytes(range(100))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_DIRECTORY, MEDIA_SERVE_MODE='python')
+class MediaServeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(f'{MEDIA_DIRECTORY}/posts')
+        with open(f'{MEDIA_DIRECTORY}/posts/photo.jpg', 'wb') as image:
+            image.write(IMAGE)
+        with open(f'{MEDIA_DIRECTORY}/secret.txt', 'w') as secret:
+            secret.write('secret')
+        cls.url = reverse('media', args=['posts/photo.jpg'])
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_DIRECTORY, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), IMAGE)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_ranges(self):
+        """один диапазон - 206 с Content-Range, суффикс -n от конца"""
+        for header, start, end in (('bytes=10-19', 10, 19),
+                                   ('bytes=-5', 95, 99),
+                                   ('bytes=90-', 90, 99),
+                                   ('bytes=95-500', 95, 99)):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.PARTIAL_CONTENT)
+                self.assertEqual(response['Content-Range'],
+                                 f'bytes {start}-{end}/100')
+                self.assertEqual(b''.join(response.streaming_content),
+                                 IMAGE[start:end + 1])
+                self.assertEqual(int(response['Content-Length']),
+                                 end - start + 1)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=200-300')
+        self.assertEqual(response.status_code,
+                         HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_ignored_ranges(self):
+        """несколько диапазонов и устаревший If-Range - файл целиком"""
+        for headers in ({'HTTP_RANGE': 'bytes=0-1,5-6'},
+                        {'HTTP_RANGE': 'bytes=0-1',
+                         'HTTP_IF_RANGE': '"stale"'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(self.url, **headers)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(b''.join(response.streaming_content),
+                                 IMAGE)
+
+    def test_conditional(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1',
+                                   HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+
+    def test_outside_prefixes(self):
+        """вне posts/ и cache/ и выход из MEDIA_ROOT - 404"""
+        for path in ('secret.txt', 'posts/../secret.txt',
+                     'posts/missing.jpg', 'posts'):
+            with self.subTest(path=path):
+                response = self.client.get(f'/media/{path}')
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_handoff_modes(self):
+        """x-accel и x-sendfile отдают файл веб-серверу, тело пустое"""
+        with self.settings(MEDIA_SERVE_MODE='x-accel'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/posts/photo.jpg')
+        self.assertEqual(response.content, b'')
+        with self.settings(MEDIA_SERVE_MODE='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'],
+                         f'{MEDIA_DIRECTORY}/posts/photo.jpg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
@@ -1,4 +1,17 @@
+import mimetypes
+import os
+import posixpath
+from stat import S_ISREG
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotAllowed)
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 
 def page_not_found(request, exception):
@@ -17,3 +30,127 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+class RangeFile:
+    """часть файла для ответа 206: читает не больше length байт"""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) включительно для одного диапазона bytes=,
+    None - отдать файл целиком, ValueError - диапазон вне файла"""
+    unit, _, ranges = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in ranges:
+        # несколько диапазонов сразу - целиком, это допускает RFC 7233
+        return None
+    first, _, last = ranges.strip().partition('-')
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError('Диапазон вне файла')
+    return start, end
+
+
+def serve_media(request, path):
+    """картинки постов и миниатюры из MEDIA_ROOT: условные запросы,
+    диапазоны Range и, по MEDIA_SERVE_MODE, передача файла веб-серверу
+    (X-Accel-Redirect для nginx, X-Sendfile для Apache и lighttpd);
+    в режиме 'python' FileResponse отдаёт открытый файл серверу,
+    и wsgi.file_wrapper (gunicorn, uWSGI) шлёт его через sendfile"""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    # префикс проверяется после нормализации: posts/../x - это x
+    path = posixpath.normpath(path).lstrip('/')
+    if not path.startswith(settings.MEDIA_SERVE_PREFIXES):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not S_ISREG(stat.st_mode):
+        raise Http404
+
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    modified = int(stat.st_mtime)
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=modified)
+    if response is None:
+        response = _media_response(request, path, full_path, stat,
+                                   content_type, etag)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified)
+    response['Cache-Control'] = f'public, max-age={settings.MEDIA_MAX_AGE}'
+    return response
+
+
+def _media_response(request, path, full_path, stat, content_type, etag):
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == 'x-accel':
+        # nginx сам отдаёт файл из internal location, включая Range
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (settings.MEDIA_ACCEL_PREFIX
+                                        + quote(path))
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+
+    size = stat.st_size
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    # If-Range с устаревшим валидатором - нужен весь файл
+    if header and if_range and if_range not in (etag, http_date(
+            int(stat.st_mtime))):
+        header = None
+    span = None
+    if header:
+        try:
+            span = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if span is None:
+        response = FileResponse(open(full_path, 'rb'),
+                                content_type=content_type)
+    else:
+        start, end = span
+        response = FileResponse(
+            RangeFile(open(full_path, 'rb'), start, end - start + 1),
+            content_type=content_type, status=206
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
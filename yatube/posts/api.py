@@ -0,0 +1,159 @@
+"""JSON-лента только для чтения
+
+строки берутся из .values() без создания моделей, поля выбираются
+параметром ?fields=, страницы - курсорами ?after=/?before=;
+ETag строится из поколений лент (как у страничного кэша), поэтому
+повторный запрос с If-None-Match получает 304 без чтения постов"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from . import page_cache, timeline
+from .jsonl import Encoder
+from .models import Comment
+from .paginators import CursorPaginator
+
+# имя в ответе -> поле для .values()
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+
+
+def _error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def _fields(request):
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(POST_FIELDS)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = sorted(set(names) - set(POST_FIELDS))
+    if unknown:
+        raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}')
+    return names
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.PAGINATOR_COUNT))
+    except ValueError:
+        raise ApiError(400, 'limit должен быть числом')
+    return max(1, min(limit, settings.API_MAX_LIMIT))
+
+
+def _serialize(rows, fields, mapping):
+    result = []
+    for row in rows:
+        item = {name: row[mapping[name]] for name in fields}
+        if item.get('image') is not None:
+            item['image'] = (default_storage.url(item['image'])
+                             if item['image'] else None)
+        result.append(item)
+    return result
+
+
+def _page(queryset, request, fields, mapping, ordering, prefix=''):
+    # поля курсора читаются всегда, даже если их нет в ответе
+    cursor_fields = [name.lstrip('-') for name in ordering]
+    paths = {mapping[name] for name in fields} | set(cursor_fields)
+    paginator = CursorPaginator(queryset.values(*paths), _limit(request),
+                                ordering=ordering)
+    page = paginator.get_page(after=request.GET.get(f'{prefix}after'),
+                              before=request.GET.get(f'{prefix}before'))
+    return {
+        'results': _serialize(page, fields, mapping),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def _conditional(request, scopes, build):
+    """304 по ETag поколений лент или ответ из build()"""
+    etag = page_cache.page_etag(request, scopes)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            response = JsonResponse(build(), encoder=Encoder,
+                                    json_dumps_params={'ensure_ascii': False})
+        except ApiError as error:
+            return _error(error.status, str(error))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'max-age=0, must-revalidate'
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _feed(request, found):
+    if found is None:
+        return _error(404, 'Не найдено')
+    scopes, posts = found
+
+    def build():
+        fields = _fields(request)
+        return _page(posts, request, fields, POST_FIELDS,
+                     ('-pub_date', '-id'))
+    return _conditional(request, scopes, build)
+
+
+@require_safe
+def index(request):
+    return _feed(request, page_cache.index_validators(request))
+
+
+@require_safe
+def group_posts(request, slug):
+    return _feed(request, page_cache.group_validators(request, slug))
+
+
+@require_safe
+def profile(request, username):
+    return _feed(request, page_cache.profile_validators(request, username))
+
+
+@require_safe
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _error(401, 'Нужна авторизация')
+    scopes = ['index', f'follow:{request.user.id}']
+    return _feed(request, (scopes, timeline.feed(request.user)))
+
+
+@require_safe
+def post_detail(request, post_id):
+    found = page_cache.post_validators(request, post_id)
+    if found is None:
+        return _error(404, 'Не найдено')
+    scopes, posts = found
+
+    def build():
+        fields = _fields(request)
+        post = posts.values(*{POST_FIELDS[name] for name in fields}).get()
+        comments = Comment.objects.filter(post_id=post_id)
+        return {
+            'post': _serialize([post], fields, POST_FIELDS)[0],
+            'comments': _page(comments, request, list(COMMENT_FIELDS),
+                              COMMENT_FIELDS, ('created', 'id'),
+                              prefix='comments_'),
+        }
+    return _conditional(request, scopes, build)
@@ -0,0 +1,83 @@
+"""денормализованные счётчики постов, комментариев и подписок"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+
+from .models import Comment, Follow, Post, UserStats
+
+
+def change(queryset, field, delta):
+    """атомарно сдвигает счётчик одним UPDATE ... SET f = f + delta,
+    не уводя его ниже нуля"""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def recount(user_ids):
+    """точные значения счётчиков для набора пользователей"""
+    counts = {user_id: {'posts_count': 0,
+                        'followers_count': 0,
+                        'following_count': 0}
+              for user_id in user_ids}
+    sources = (
+        ('posts_count', Post.objects, 'author'),
+        ('followers_count', Follow.objects, 'author'),
+        ('following_count', Follow.objects, 'user'),
+    )
+    for field, manager, column in sources:
+        rows = (manager.filter(**{f'{column}__in': user_ids}).order_by()
+                .values(column).annotate(count=Count('id'))
+                .values_list(column, 'count'))
+        for user_id, count in rows:
+            counts[user_id][field] = count
+    return counts
+
+
+def stats_for(user):
+    """счётчики пользователя; отсутствующая строка создаётся
+    с пересчётом, дальше её поддерживают сигналы"""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        pass
+    defaults = recount([user.pk])[user.pk]
+    try:
+        with transaction.atomic():
+            stats, _ = UserStats.objects.get_or_create(user=user,
+                                                       defaults=defaults)
+    except IntegrityError:
+        stats = UserStats.objects.get(user=user)
+    user.stats = stats
+    return stats
+
+
+def reconcile_comments(post_ids):
+    """исправляет comment_count у постов, возвращает число исправленных"""
+    comments = (Comment.objects.filter(post=OuterRef('pk')).order_by()
+                .values('post').annotate(count=Count('id'))
+                .values('count'))
+    posts = Post.objects.filter(id__in=post_ids).annotate(
+        actual=Subquery(comments)
+    ).values_list('id', 'comment_count', 'actual')
+    fixed = 0
+    for post_id, stored, actual in posts:
+        if stored != (actual or 0):
+            Post.objects.filter(id=post_id).update(comment_count=actual or 0)
+            fixed += 1
+    return fixed
+
+
+def reconcile_users(user_ids):
+    """исправляет счётчики пользователей, возвращает число исправленных"""
+    actual = recount(user_ids)
+    stored = UserStats.objects.in_bulk(user_ids)
+    fixed = 0
+    for user_id, counts in actual.items():
+        stats = stored.get(user_id)
+        if stats is None:
+            continue
+        if any(getattr(stats, field) != value
+               for field, value in counts.items()):
+            UserStats.objects.filter(user_id=user_id).update(**counts)
+            fixed += 1
+    return fixed
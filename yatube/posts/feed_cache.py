@@ -0,0 +1,46 @@
+"""поколения кэша лент: ключи фрагментов включают счётчики
+поколений, которые сигналы моделей увеличивают при изменениях,
+поэтому фрагменты можно хранить долго без устаревания"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _key(scope):
+    return f'feedgen:{scope}'
+
+
+def _initial():
+    # поколение после вытеснения ключа не должно совпасть
+    # с одним из прежних, поэтому начинаем с текущего времени
+    return time.time_ns() // 1000
+
+
+def version(*scopes):
+    """строка поколений для набора лент, один запрос к кэшу"""
+    keys = [_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _initial(), None)
+            values[key] = cache.get(key)
+    return '-'.join(f'{scope}={values[key]}'
+                    for scope, key in zip(scopes, keys))
+
+
+def bump(*scopes):
+    """новое поколение лент: старые фрагменты больше не читаются"""
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.add(_key(scope), _initial(), None)
+
+
+def context(*scopes):
+    """переменные шаблона для тега {% cache %}"""
+    return {
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'cache_version': version(*scopes),
+    }
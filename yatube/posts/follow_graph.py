@@ -0,0 +1,57 @@
+"""граф подписок: авторы, на которых подписан читатель, хранятся
+в кэше отсортированным массивом int32 и проверяются бинарным
+поиском; сигналы Follow сбрасывают массив читателя"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import Follow
+
+
+def _key(user_id):
+    return f'follows:{user_id}'
+
+
+def following_ids(user_id):
+    """отсортированный array('i') id авторов читателя"""
+    ids = array('i')
+    data = cache.get(_key(user_id))
+    if data is not None:
+        ids.frombytes(data)
+        return ids
+    ids.extend(Follow.objects.filter(user_id=user_id)
+               .order_by('author_id').values_list('author_id', flat=True))
+    cache.set(_key(user_id), ids.tobytes(), settings.FOLLOW_GRAPH_TIMEOUT)
+    return ids
+
+
+def is_following(user_id, author_id):
+    ids = following_ids(user_id)
+    position = bisect_left(ids, author_id)
+    return position < len(ids) and ids[position] == author_id
+
+
+def invalidate(user_id):
+    cache.delete(_key(user_id))
+
+
+def follow(user, author):
+    """подписка одним INSERT: повтор упирается в уникальность
+    и ничего не меняет; возвращает, появилась ли подписка"""
+    if user.id == author.id:
+        return False
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user, author):
+    """отписка без предварительной проверки; повтор ничего не меняет"""
+    deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    return deleted > 0
@@ -0,0 +1,195 @@
+"""обработка картинок постов при загрузке
+
+оригинал проверяется на «бомбу декомпрессии» до декодирования,
+поворачивается по EXIF, уменьшается и пересохраняется без метаданных;
+для ленты пишутся варианты нескольких ширин (WebP, если Pillow
+его поддерживает, иначе JPEG), которые шаблон отдаёт через srcset"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps, features
+
+from . import feed_cache
+from .models import Post
+
+
+# пропорции миниатюры ленты, как у {% thumbnail ... "960x339" %}
+FEED_RATIO = 339 / 960
+
+VARIANTS_DIR = 'posts/variants'
+
+CONTENT_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png',
+                 'GIF': 'image/gif', 'WEBP': 'image/webp'}
+# многокадровые JPEG (MPO) с камер телефонов и многостраничные TIFF
+# не анимация: от них остаётся первый кадр, пересохранённый в JPEG
+ANIMATED_FORMATS = ('GIF', 'WEBP', 'PNG')
+# режимы, которые пишут все форматы CONTENT_TYPES (JPEG - после
+# перевода в RGB в _encode)
+ENCODABLE_MODES = ('RGB', 'RGBA', 'L', 'LA', 'P')
+
+
+def variant_format():
+    if settings.IMAGE_VARIANT_FORMAT == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return settings.IMAGE_VARIANT_FORMAT
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(buffer, 'JPEG', quality=settings.IMAGE_QUALITY,
+                   optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=settings.IMAGE_QUALITY,
+                   method=4)
+    else:
+        image.save(buffer, image_format, optimize=True)
+    return buffer.getvalue()
+
+
+def normalize(upload):
+    """проверенная и уменьшенная копия загруженной картинки
+    с тем же именем; бросает ValidationError"""
+    upload.seek(0)
+    try:
+        # open читает только заголовок, пиксели ещё не декодированы
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать изображение.')
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Изображение слишком большое: {width}×{height} точек.'
+        )
+    image_format = image.format
+    if (getattr(image, 'is_animated', False)
+            and image_format in ANIMATED_FORMATS):
+        # пересохранение потеряет анимацию - оставляем как есть
+        upload.seek(0)
+        return upload
+    try:
+        # exif_transpose сам декодирует первый кадр; EXIF нужно прочитать
+        # до load(): у многостраничного TIFF Pillow закрывает файл
+        image = ImageOps.exif_transpose(image)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать изображение.')
+
+    for key in ('exif', 'xmp', 'comment', 'dpi'):
+        image.info.pop(key, None)
+    try:
+        return _resaved(image, image_format, upload.name)
+    except (OSError, ValueError):
+        raise ValidationError('Не удалось обработать изображение.')
+
+
+def _resaved(image, image_format, name):
+    """уменьшенная копия в исходном формате или, если его нет
+    в CONTENT_TYPES, в JPEG/PNG"""
+    # CMYK, LAB, 16-битные и float-режимы TIFF не сохраняются
+    # в PNG: в RGB, а с прозрачностью - в RGBA
+    if image.mode not in ENCODABLE_MODES:
+        image = image.convert(
+            'RGBA' if image.mode.endswith(('A', 'a')) else 'RGB'
+        )
+    side = settings.IMAGE_MAX_SIDE
+    image.thumbnail((side, side), Image.LANCZOS)
+    if image_format not in CONTENT_TYPES or image_format == 'WEBP':
+        image_format = 'JPEG' if image.mode in ('RGB', 'L') else 'PNG'
+        name = (os.path.splitext(name)[0]
+                + ('.jpg' if image_format == 'JPEG' else '.png'))
+    return SimpleUploadedFile(name, _encode(image, image_format),
+                              content_type=CONTENT_TYPES[image_format])
+
+
+def variant_name(name, width, extension=None):
+    """имя варианта по полному имени картинки: расширение входит
+    в хэш, поэтому у photo.jpg и photo.png разные варианты"""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    digest = hashlib.sha1(name.encode()).hexdigest()[:10]
+    if extension is None:
+        extension = 'webp' if variant_format() == 'WEBP' else 'jpg'
+    return f'{VARIANTS_DIR}/{stem}-{digest}-{width}w.{extension}'
+
+
+def delete_variants(name):
+    """варианты прежней картинки поста, заменённой или убранной"""
+    for width in settings.IMAGE_VARIANT_WIDTHS:
+        for extension in ('webp', 'jpg'):
+            try:
+                default_storage.delete(variant_name(name, width, extension))
+            except SuspiciousFileOperation:
+                return
+
+
+def widths(post):
+    return [int(width) for width in post.image_widths.split(',')
+            if width.isdigit()]
+
+
+def write_variants(post_id, name):
+    """варианты ленты для картинки поста; ширины записываются
+    в Post.image_widths, ленты поста получают новое поколение"""
+    written = []
+    if name:
+        try:
+            with default_storage.open(name) as source:
+                image = Image.open(source)
+                image.load()
+        except (OSError, SuspiciousFileOperation,
+                Image.DecompressionBombError):
+            # файла нет или он вне MEDIA_ROOT - вариантов не будет
+            image = None
+        if image is not None:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA', 'L'):
+                image = image.convert('RGBA')
+            for width in settings.IMAGE_VARIANT_WIDTHS:
+                if width > image.width and written:
+                    break
+                size = (width, round(width * FEED_RATIO))
+                variant = ImageOps.fit(image, size, Image.LANCZOS)
+                path = variant_name(name, width)
+                default_storage.delete(path)
+                default_storage.save(path, ContentFile(
+                    _encode(variant, variant_format())
+                ))
+                written.append(width)
+
+    post = (Post.objects.filter(id=post_id)
+            .values('author_id', 'group_id').first())
+    if post is None:
+        return written
+    Post.objects.filter(id=post_id).update(
+        image_widths=','.join(map(str, written))
+    )
+    scopes = ['index', f'post:{post_id}', f'profile:{post["author_id"]}']
+    if post['group_id']:
+        scopes.append(f'group:{post["group_id"]}')
+    feed_cache.bump(*scopes)
+    return written
+
+
+def srcset(post):
+    return ', '.join(
+        f'{default_storage.url(variant_name(post.image.name, width))} '
+        f'{width}w'
+        for width in widths(post)
+    )
+
+
+def variant_url(post, width):
+    """адрес самого широкого варианта не шире width"""
+    available = widths(post)
+    if not available:
+        return ''
+    fitting = [value for value in available if value <= width]
+    chosen = max(fitting) if fitting else min(available)
+    return default_storage.url(variant_name(post.image.name, chosen))
@@ -0,0 +1,148 @@
+"""потоковый перенос данных в формате JSONL
+
+каждая строка - {"model": "posts.post", "fields": {...}} с id
+и внешними ключами как есть; экспорт читает таблицы итератором
+по возрастанию id, импорт собирает пачки и вставляет их через
+executemany, поэтому память не зависит от объёма данных"""
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+
+from . import search
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# порядок выгрузки: внешние ключи ссылаются на строки выше;
+# comment_count и image_widths пересчитываются после загрузки
+MODELS = {
+    'auth.user': (User, ('id', 'password', 'last_login', 'is_superuser',
+                         'username', 'first_name', 'last_name', 'email',
+                         'is_staff', 'is_active', 'date_joined')),
+    'posts.group': (Group, ('id', 'title', 'slug', 'description')),
+    'posts.post': (Post, ('id', 'text', 'pub_date', 'author_id',
+                          'group_id', 'image')),
+    'posts.comment': (Comment, ('id', 'post_id', 'author_id', 'text',
+                                'created')),
+    'posts.follow': (Follow, ('id', 'user_id', 'author_id')),
+}
+
+CHUNK_SIZE = 2000
+
+
+class Encoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder обрезает микросекунды, а по дате с id
+    # строится курсорная пагинация
+    def default(self, value):
+        if isinstance(value, datetime.datetime):
+            return value.isoformat()
+        return super().default(value)
+
+
+def export_rows(output, labels=None):
+    """пишет строки моделей в output, возвращает {метка: число}"""
+    encoder = Encoder(ensure_ascii=False)
+    written = {}
+    for label, (model, fields) in MODELS.items():
+        if labels and label not in labels:
+            continue
+        rows = (model.objects.order_by('id').values(*fields)
+                .iterator(chunk_size=CHUNK_SIZE))
+        written[label] = 0
+        for row in rows:
+            output.write(encoder.encode({'model': label, 'fields': row}))
+            output.write('\n')
+            written[label] += 1
+    return written
+
+
+def _columns(model, connection):
+    """поля таблицы модели и преобразование значения из файла:
+    даты разбираются и приводятся к виду базы, остальные значения
+    JSON записываются как есть"""
+    columns = []
+    for field in model._meta.concrete_fields:
+        convert = None
+        if field.get_internal_type() in ('DateTimeField', 'DateField'):
+            def convert(value, field=field):
+                # выгрузка пишет isoformat(): fromisoformat быстрее
+                # разбора регулярным выражением в to_python
+                try:
+                    value = datetime.datetime.fromisoformat(value)
+                except (TypeError, ValueError):
+                    value = field.to_python(value)
+                return field.get_db_prep_save(value, connection)
+        columns.append((field, convert))
+    return columns
+
+
+def _statement(model, columns, connection):
+    quote = connection.ops.quote_name
+    names = ', '.join(quote(field.column) for field, _ in columns)
+    values = ', '.join(['%s'] * len(columns))
+    return (f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+            f'{quote(model._meta.db_table)} ({names}) VALUES ({values}) '
+            f'{connection.ops.ignore_conflicts_suffix_sql(True)}')
+
+
+def _flush(model, rows):
+    """одна транзакция на пачку, строки - одним executemany; модели
+    не создаются и pre_save не вызывается, поэтому auto_now_add
+    не перезаписывает даты из файла временем загрузки"""
+    alias = router.db_for_write(model)
+    connection = connections[alias]
+    columns = _columns(model, connection)
+    defaults = [field.get_db_prep_save(field.get_default(), connection)
+                for field, _ in columns]
+    params = []
+    for row in rows:
+        values = []
+        for (field, convert), default in zip(columns, defaults):
+            if field.attname not in row:
+                values.append(default)
+            elif convert is None or row[field.attname] is None:
+                values.append(row[field.attname])
+            else:
+                values.append(convert(row[field.attname]))
+        params.append(values)
+    with transaction.atomic(using=alias):
+        with connection.cursor() as cursor:
+            cursor.executemany(_statement(model, columns, connection),
+                               params)
+
+
+def import_rows(lines, batch_size=10000):
+    """загружает строки пачками по batch_size, каждая пачка -
+    отдельная транзакция; строки с уже занятым id пропускаются;
+    сигналы моделей не отправляются, поэтому счётчики, ленты
+    и поколения кэша обновляет вызывающий код; триггеры поискового
+    индекса на время загрузки снимаются, индекс пересобирается
+    один раз в конце"""
+    loaded = {}
+    model, batch = None, []
+    with search.suspended():
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            label = record['model']
+            if label not in MODELS:
+                raise ValueError(f'Строка {number}: неизвестная модель '
+                                 f'{label}')
+            current, fields = MODELS[label]
+            # пачка не смешивает модели, порядок строк файла сохраняется
+            if batch and (current is not model or len(batch) >= batch_size):
+                _flush(model, batch)
+                batch = []
+            model = current
+            # поля вне списка выгрузки получают значения по умолчанию
+            batch.append({field: value
+                          for field, value in record['fields'].items()
+                          if field in fields})
+            loaded[label] = loaded.get(label, 0) + 1
+        if batch:
+            _flush(model, batch)
+    return loaded
@@ -0,0 +1,88 @@
+"""хранилище метаданных sorl-thumbnail с локальным LRU в процессе
+
+перед общим кэшем и таблицей thumbnail_kvstore стоит ограниченный
+словарь процесса; prefetch достаёт ключи всей страницы одним
+обращением к кэшу и одним запросом к базе"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    def __init__(self):
+        super().__init__()
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, value):
+        # отсутствие ключа локально не запоминаем: миниатюру может
+        # создать другой процесс, и ждущий её запрос должен это увидеть
+        if value is None or value == EMPTY_VALUE:
+            return
+        expires = time.monotonic() + settings.THUMBNAIL_LOCAL_TIMEOUT
+        with self._lock:
+            self._local[key] = (expires, value)
+            self._local.move_to_end(key)
+            while len(self._local) > settings.THUMBNAIL_LOCAL_SIZE:
+                self._local.popitem(last=False)
+
+    def _recall(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _get_raw(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = super()._get_raw(key)
+            self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        with self._lock:
+            self._local.clear()
+
+    def prefetch(self, image_files):
+        """загружает записи для набора ImageFile: один get_many
+        к кэшу и один запрос к базе на промахи"""
+        keys = {add_prefix(image_file.key) for image_file in image_files}
+        keys = [key for key in keys if self._recall(key) is None]
+        if not keys:
+            return
+        found = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            rows = dict(KVStoreModel.objects.filter(key__in=missing)
+                        .values_list('key', 'value'))
+            # как и _get_raw, запоминаем в кэше и отсутствие записи
+            fetched = {key: rows.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(fetched,
+                                thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+            found.update(fetched)
+        for key, value in found.items():
+            self._remember(key, value)
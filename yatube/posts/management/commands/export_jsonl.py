@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import jsonl
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии '
+            'и подписки в JSONL потоком')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл для выгрузки, - для stdout')
+        parser.add_argument('--model', action='append',
+                            choices=list(jsonl.MODELS), dest='models',
+                            help='выгрузить только эти модели')
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            written = jsonl.export_rows(sys.stdout, options['models'])
+            output = sys.stderr
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as file:
+                written = jsonl.export_rows(file, options['models'])
+            output = self.stdout
+        output.write(', '.join(f'{label}: {count}'
+                               for label, count in written.items()) + '\n')
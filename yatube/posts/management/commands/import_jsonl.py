@@ -0,0 +1,46 @@
+import sys
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import jsonl
+
+
+class Command(BaseCommand):
+    help = ('Загружает JSONL из export_jsonl пачками INSERT '
+            'и пересчитывает производные данные')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл выгрузки, - для stdin')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--skip-finalize', action='store_true',
+                            help='не пересчитывать счётчики и ленты')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options['path'] == '-':
+                loaded = jsonl.import_rows(sys.stdin, options['batch_size'])
+            else:
+                with open(options['path'], encoding='utf-8') as file:
+                    loaded = jsonl.import_rows(file, options['batch_size'])
+        except (ValueError, KeyError) as error:
+            # загруженные до ошибки пачки остаются в базе
+            raise CommandError(f'Ошибка в файле выгрузки: {error}')
+        elapsed = time.perf_counter() - started
+        total = sum(loaded.values())
+        self.stdout.write(
+            ', '.join(f'{label}: {count}' for label, count in loaded.items())
+            + f'; {total / max(elapsed, 1e-9):.0f} строк/с'
+        )
+        if options['skip_finalize'] or not total:
+            return
+
+        # сигналы при загрузке не срабатывали: счётчики, ленты
+        # и поколения кэша приводим в порядок после загрузки
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_timelines', stdout=self.stdout)
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
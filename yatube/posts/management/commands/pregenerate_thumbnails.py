@@ -0,0 +1,110 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import images, thumbnails
+from posts.models import Post
+
+
+def pregenerate_batch(ids):
+    """миниатюры и варианты пачки постов; выполняется в процессе пула"""
+    posts = (Post.objects.filter(id__in=ids).exclude(image='')
+             .values_list('id', 'image', 'image_widths'))
+    created = 0
+    for post_id, image, widths in posts:
+        if not widths:
+            images.write_variants(post_id, image)
+        if thumbnails.pregenerate(image):
+            created += 1
+    return ids[-1], created
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры и варианты картинок постов заранее; '
+            'после прерывания продолжает с места остановки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='число процессов, 0 - без пула')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--state',
+            default=os.path.join(settings.BASE_DIR, 'cache',
+                                 'pregenerate_thumbnails.state'),
+            help='файл с последним обработанным id'
+        )
+        parser.add_argument('--restart', action='store_true',
+                            help='начать с первого поста')
+
+    def read_state(self, path):
+        try:
+            with open(path) as state:
+                return int(state.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def write_state(self, path, last_id):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'w') as state:
+            state.write(str(last_id))
+        os.replace(path + '.tmp', path)
+
+    def batches(self, last_id, size):
+        """id постов с картинками пачками по возрастанию, без OFFSET"""
+        posts = Post.objects.exclude(image='').order_by('id')
+        while True:
+            ids = list(posts.filter(id__gt=last_id)
+                       .values_list('id', flat=True)[:size])
+            if not ids:
+                return
+            yield ids
+            last_id = ids[-1]
+
+    def results(self, batches, workers):
+        """(число постов, результат) пачек по порядку; в работе не больше
+        workers * 2 пачек, id следующих читаются по мере освобождения"""
+        if workers <= 0:
+            for ids in batches:
+                yield len(ids), pregenerate_batch(ids)
+            return
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for ids in batches:
+                # процессы пула создаются fork'ом по мере надобности,
+                # открытое соединение с базой им передавать нельзя
+                connections.close_all()
+                pending.append(
+                    (len(ids), executor.submit(pregenerate_batch, ids))
+                )
+                if len(pending) >= workers * 2:
+                    count, future = pending.popleft()
+                    yield count, future.result()
+            while pending:
+                count, future = pending.popleft()
+                yield count, future.result()
+
+    def handle(self, *args, **options):
+        state = options['state']
+        last_id = 0 if options['restart'] else self.read_state(state)
+        total = (Post.objects.exclude(image='')
+                 .filter(id__gt=last_id).count())
+        self.stdout.write(f'Постов с картинками: {total}, '
+                          f'начинаем после id {last_id}')
+
+        batches = self.batches(last_id, options['batch_size'])
+        done = created = 0
+        # пачки отдаются по порядку, поэтому сохранённый id -
+        # граница, до которой всё обработано
+        for count, (batch_last_id, batch_created) in self.results(
+                batches, options['workers']):
+            done += count
+            created += batch_created
+            self.write_state(state, batch_last_id)
+            self.stdout.write(f'{done}/{total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, миниатюр: {created}'
+        ))
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from posts import timeline
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='пользователи, чьи ленты пересобрать (по умолчанию все)'
+        )
+        parser.add_argument(
+            '--backfill-only', action='store_true',
+            help='только разложить посты авторов, выбывших из популярных'
+        )
+
+    def handle(self, *args, **options):
+        # порог популярности мог измениться - пересчитываем его
+        cache.delete(timeline.CELEBRITIES_CACHE_KEY)
+        timeline.celebrity_ids()
+        authors = timeline.backfill_pending()
+        if options['backfill_only']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Разложены посты авторов: {authors}'
+            ))
+            return
+
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        else:
+            users = User.objects.filter(
+                Q(follower__isnull=False) | Q(timeline__isnull=False)
+            ).distinct()
+        user_ids = list(users.order_by('id').values_list('id', flat=True))
+
+        for number, user_id in enumerate(user_ids, start=1):
+            with transaction.atomic():
+                timeline.rebuild(user_id)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{number}/{len(user_ids)}: {user_id}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {len(user_ids)}'
+        ))
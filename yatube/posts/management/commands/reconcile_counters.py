@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from posts.models import Post
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с таблицами и исправляет их'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def batches(self, queryset, size):
+        """идентификаторы пачками по возрастанию, без OFFSET"""
+        last_id = 0
+        while True:
+            ids = list(queryset.filter(id__gt=last_id).order_by('id')
+                       .values_list('id', flat=True)[:size])
+            if not ids:
+                return
+            yield ids
+            last_id = ids[-1]
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+
+        fixed_posts = sum(
+            counters.reconcile_comments(ids)
+            for ids in self.batches(Post.objects.all(), size)
+        )
+        fixed_users = sum(
+            counters.reconcile_users(ids)
+            for ids in self.batches(User.objects.all(), size)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено постов: {fixed_posts}, '
+            f'пользователей: {fixed_users}'
+        ))
@@ -0,0 +1,79 @@
+from django.db import migrations
+
+# схема на момент миграции: posts.search может меняться дальше,
+# а историческая миграция должна делать то же, что при создании
+
+
+class SQLiteRunSQL(migrations.RunSQL):
+    """FTS5 есть только в SQLite, на других базах поиск идёт
+    через icontains и таблица не нужна"""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor,
+                                      from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor,
+                                       from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_image_widths'),
+    ]
+
+    operations = [
+        SQLiteRunSQL(
+            sql=[
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts
+                USING fts5(
+                    text,
+                    content='posts_post',
+                    content_rowid='id',
+                    tokenize="unicode61 remove_diacritics 2",
+                    prefix='2 3'
+                )""",
+                """
+                CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+                AFTER INSERT ON posts_post BEGIN
+                    INSERT INTO posts_post_fts (rowid, text)
+                    VALUES (new.id, replace(replace(new.text,
+                                                    'ё', 'е'), 'Ё', 'Е'));
+                END""",
+                """
+                CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+                AFTER DELETE ON posts_post BEGIN
+                    INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+                    VALUES ('delete', old.id,
+                            replace(replace(old.text, 'ё', 'е'), 'Ё', 'Е'));
+                END""",
+                """
+                CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+                AFTER UPDATE OF text ON posts_post BEGIN
+                    INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+                    VALUES ('delete', old.id,
+                            replace(replace(old.text, 'ё', 'е'), 'Ё', 'Е'));
+                    INSERT INTO posts_post_fts (rowid, text)
+                    VALUES (new.id, replace(replace(new.text,
+                                                    'ё', 'е'), 'Ё', 'Е'));
+                END""",
+                # индекс уже опубликованных постов
+                """
+                INSERT INTO posts_post_fts (rowid, text)
+                SELECT id, replace(replace(text, 'ё', 'е'), 'Ё', 'Е')
+                FROM posts_post""",
+            ],
+            reverse_sql=[
+                'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+                'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+                'DROP TRIGGER IF EXISTS posts_post_fts_update',
+                'DROP TABLE IF EXISTS posts_post_fts',
+            ],
+        ),
+    ]
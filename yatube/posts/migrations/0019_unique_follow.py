@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:51
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+def remove_duplicates(apps, schema_editor):
+    """оставляет первую из повторных подписок и убирает подписки
+    на себя; счётчики затронутых пользователей пересчитаются
+    при следующем обращении"""
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    # id оставляемых подписок - подзапросом, а не списком параметров:
+    # на большой таблице список упирается в предел переменных SQLite
+    first = (Follow.objects.values('user', 'author')
+             .annotate(first_id=models.Min('id'))
+             .values('first_id'))
+    extra = (Follow.objects.exclude(id__in=first)
+             | Follow.objects.filter(user=models.F('author')))
+    UserStats.objects.filter(
+        models.Q(user_id__in=extra.values('user_id'))
+        | models.Q(user_id__in=extra.values('author_id'))
+    ).delete()
+    extra.delete()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='follow_user_author_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='follow_not_self'),
+        ),
+    ]
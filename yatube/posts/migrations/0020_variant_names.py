@@ -0,0 +1,38 @@
+import os
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import migrations
+
+
+def forget_old_variants(apps, schema_editor):
+    """варианты назывались по имени картинки без расширения, и у
+    photo.jpg и photo.png разных постов совпадали; старые файлы
+    удаляются, ширины сбрасываются - лента показывает миниатюру,
+    пока pregenerate_thumbnails не запишет варианты под новыми
+    именами"""
+    Post = apps.get_model('posts', 'Post')
+    posts = (Post.objects.exclude(image_widths='')
+             .values_list('image', 'image_widths').iterator())
+    for name, widths in posts:
+        stem = os.path.splitext(os.path.basename(name))[0]
+        for width in widths.split(','):
+            for extension in ('webp', 'jpg'):
+                try:
+                    default_storage.delete(
+                        f'posts/variants/{stem}-{width}w.{extension}'
+                    )
+                except SuspiciousFileOperation:
+                    pass
+    Post.objects.exclude(image_widths='').update(image_widths='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_unique_follow'),
+    ]
+
+    operations = [
+        migrations.RunPython(forget_old_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,110 @@
+"""полностраничный кэш для анонимных пользователей
+
+ETag строится из поколений лент страницы (feed_cache), строки запроса
+и языка, поэтому повторный запрос с If-None-Match получает 304 без
+обращения к шаблонам; Last-Modified не отправляется: правка поста
+его не сдвигает, а удаление сдвигает назад"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import translation
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import quote_etag
+
+from . import feed_cache
+from .models import Group, Post
+
+
+User = get_user_model()
+
+
+def index_validators(request):
+    return ['index'], Post.objects.all()
+
+
+def group_validators(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list('id', flat=True)
+    if not group_id:
+        return None
+    return ([f'group:{group_id[0]}'],
+            Post.objects.filter(group_id=group_id[0]))
+
+
+def profile_validators(request, username):
+    user_id = (User.objects.filter(username=username)
+               .values_list('id', flat=True))
+    if not user_id:
+        return None
+    return ([f'profile:{user_id[0]}'],
+            Post.objects.filter(author_id=user_id[0]))
+
+
+def post_validators(request, post_id):
+    post = (Post.objects.filter(id=post_id)
+            .values('author_id', 'group_id').first())
+    if post is None:
+        return None
+    return ([f'post:{post_id}', f'profile:{post["author_id"]}',
+             f'group:{post["group_id"]}'],
+            Post.objects.filter(id=post_id))
+
+
+def page_etag(request, scopes):
+    raw = '|'.join((
+        feed_cache.version(*scopes),
+        request.path,
+        '&'.join(sorted(request.GET.urlencode().split('&'))),
+        translation.get_language() or '',
+    ))
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def _finalize(response, etag):
+    response['ETag'] = etag
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+    return response
+
+
+def anonymous_page_cache(validators):
+    """кэширует ответ вьюхи для анонимных GET-запросов;
+    validators(request, **kwargs) возвращает ленты страницы и её посты,
+    либо None, если объекта нет"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            found = validators(request, **kwargs)
+            if found is None:
+                return view(request, *args, **kwargs)
+            scopes, _ = found
+
+            etag = page_etag(request, scopes)
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return _finalize(response, etag)
+
+            key = f'page:body:{etag}'
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return _finalize(
+                    HttpResponse(content, content_type=content_type), etag
+                )
+
+            response = view(request, *args, **kwargs)
+            if (response.status_code != 200 or response.streaming
+                    or response.cookies):
+                return response
+            cache.set(key, (response.content, response['Content-Type']),
+                      settings.FEED_CACHE_TIMEOUT)
+            return _finalize(response, etag)
+        return wrapper
+    return decorator
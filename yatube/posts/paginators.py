@@ -0,0 +1,197 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class CachedCountPaginator(Paginator):
+    """нумерованная пагинация без COUNT(*) на каждый запрос:
+    число записей хранится в кэше под ключом с поколением ленты
+    и пересчитывается, только когда лента меняется"""
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        key = f'feedcount:{self.count_key}'
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+    def _get_page(self, *args, **kwargs):
+        # тип страницы остаётся Page, свёрнутый диапазон - атрибут
+        page = super()._get_page(*args, **kwargs)
+        page.elided_page_range = list(
+            self.get_elided_page_range(page.number)
+        )
+        return page
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        """номера страниц вокруг текущей и по краям,
+        пропуски между ними отмечены ELLIPSIS"""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class CursorPage(Page):
+    """страница курсорной пагинации: вместо номера страницы
+    хранит непрозрачные токены соседних страниц"""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page %s..%s>' % (self.previous_cursor or '',
+                                         self.next_cursor or '')
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """пагинация по ключу (keyset): страница выбирается условием
+    WHERE по полям сортировки, без OFFSET и без COUNT(*),
+    поэтому стоимость страницы не зависит от её глубины"""
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) != 1:
+            raise ValueError(
+                'Все поля курсора должны сортироваться в одну сторону'
+            )
+        self.ordering = tuple(ordering)
+        self.descending = descending.pop()
+        self.fields = [field.lstrip('-') for field in ordering]
+
+    def get_page(self, after=None, before=None):
+        """возвращает страницу после курсора after или перед before,
+        при некорректном курсоре - первую страницу"""
+        try:
+            if before:
+                return self._page_before(self.decode(before))
+            if after:
+                return self._page_after(self.decode(after))
+        except ValidationError:
+            pass
+        return self._page_after(None)
+
+    def encode(self, row):
+        values = [
+            row[name] if isinstance(row, dict) else getattr(row, name)
+            for name in self.fields
+        ]
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, token):
+        try:
+            padding = '=' * (-len(token) % 4)
+            values = json.loads(base64.urlsafe_b64decode(token + padding))
+        except (binascii.Error, ValueError):
+            raise ValidationError('Некорректный курсор')
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise ValidationError('Некорректный курсор')
+        result = []
+        for name, value in zip(self.fields, values):
+            # подделанный курсор: null, число вместо даты, словарь,
+            # id больше 64-битного целого - та же первая страница
+            if value is None:
+                raise ValidationError('Некорректный курсор')
+            field = self._model_field(name)
+            try:
+                value = field.to_python(value)
+            except (TypeError, ValueError):
+                raise ValidationError('Некорректный курсор')
+            if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+                raise ValidationError('Некорректный курсор')
+            result.append(value)
+        return result
+
+    def _model_field(self, name):
+        return self.object_list.model._meta.get_field(name)
+
+    def _keyset(self, values, forward):
+        """условие (a, b) < (va, vb), развёрнутое в
+        a < va OR (a = va AND b < vb) для любого числа полей"""
+        lookup = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for position, name in enumerate(self.fields):
+            equal = {
+                field: value for field, value in
+                zip(self.fields[:position], values[:position])
+            }
+            equal[f'{name}__{lookup}'] = values[position]
+            condition |= Q(**equal)
+        return condition
+
+    def _page_after(self, values):
+        queryset = self.object_list.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self._keyset(values, forward=True))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        next_cursor = self.encode(rows[-1]) if has_more else None
+        previous_cursor = (self.encode(rows[0])
+                           if values is not None and rows else None)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def _page_before(self, values):
+        if self.descending:
+            reverse = self.fields
+        else:
+            reverse = [f'-{name}' for name in self.fields]
+        queryset = self.object_list.order_by(*reverse).filter(
+            self._keyset(values, forward=False)
+        )
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+
+        previous_cursor = self.encode(rows[0]) if has_more else None
+        next_cursor = self.encode(rows[-1]) if rows else None
+        return CursorPage(rows, self, next_cursor, previous_cursor)
@@ -0,0 +1,148 @@
+"""полнотекстовый поиск по постам на SQLite FTS5
+
+таблица posts_post_fts хранит только индекс по тексту постов
+(content='posts_post'), триггеры обновляют его при каждом INSERT,
+UPDATE и DELETE, в том числе из bulk_create и update(); unicode61
+приводит регистр и снимает диакритику латиницы, «ё» заменяется
+на «е» при индексации и в запросе, а каждое слово запроса ищется
+как префикс вместо стемминга"""
+import re
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.models import Q
+
+TABLE = 'posts_post_fts'
+
+# слов в запросе не больше - длинный MATCH ничего не уточняет
+MAX_TERMS = 8
+
+WORD = re.compile(r'\w+')
+
+
+def _folded(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+SCHEMA = {
+    'table': f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+            text,
+            content='posts_post',
+            content_rowid='id',
+            tokenize="unicode61 remove_diacritics 2",
+            prefix='2 3'
+        )""",
+    'trigger': {
+        f'{TABLE}_insert': f"""
+            CREATE TRIGGER IF NOT EXISTS {TABLE}_insert
+            AFTER INSERT ON posts_post BEGIN
+                INSERT INTO {TABLE} (rowid, text)
+                VALUES (new.id, {_folded('new.text')});
+            END""",
+        f'{TABLE}_delete': f"""
+            CREATE TRIGGER IF NOT EXISTS {TABLE}_delete
+            AFTER DELETE ON posts_post BEGIN
+                INSERT INTO {TABLE} ({TABLE}, rowid, text)
+                VALUES ('delete', old.id, {_folded('old.text')});
+            END""",
+        f'{TABLE}_update': f"""
+            CREATE TRIGGER IF NOT EXISTS {TABLE}_update
+            AFTER UPDATE OF text ON posts_post BEGIN
+                INSERT INTO {TABLE} ({TABLE}, rowid, text)
+                VALUES ('delete', old.id, {_folded('old.text')});
+                INSERT INTO {TABLE} (rowid, text)
+                VALUES (new.id, {_folded('new.text')});
+            END""",
+    },
+}
+
+
+def available(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def _missing(cursor):
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') "
+        "AND name IN (%s, %s, %s, %s)", [TABLE, *SCHEMA['trigger']]
+    )
+    existing = {name for name, in cursor.fetchall()}
+    return ({TABLE} | set(SCHEMA['trigger'])) - existing
+
+
+def install(using='default', repair=False):
+    """создаёт индекс и недостающие триггеры и пересобирает индекс;
+    с repair=True - только если индекс уже создан миграцией,
+    а триггеры пропали: перестройка таблицы posts_post при миграции
+    SQLite удаляет их вместе со старой таблицей"""
+    if not available(using):
+        return False
+    with connections[using].cursor() as cursor:
+        missing = _missing(cursor)
+        if not missing or (repair and TABLE in missing):
+            return False
+        cursor.execute(SCHEMA['table'])
+        for sql in SCHEMA['trigger'].values():
+            cursor.execute(sql)
+        # 'rebuild' читал бы текст без замены «ё»
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('delete-all')")
+        cursor.execute(f"INSERT INTO {TABLE} (rowid, text) "
+                       f"SELECT id, {_folded('text')} FROM posts_post")
+    return True
+
+
+def uninstall(using='default'):
+    if not available(using):
+        return
+    with connections[using].cursor() as cursor:
+        for name in SCHEMA['trigger']:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+@contextmanager
+def suspended(using='default'):
+    """массовая загрузка без триггеров: каждая вставка иначе
+    обновляет индекс построчно; после - триггеры и индекс заново,
+    в том числе для постов, записанных параллельно загрузке"""
+    if not available(using):
+        yield
+        return
+    with connections[using].cursor() as cursor:
+        if TABLE in _missing(cursor):
+            # индекса нет - и пересобирать нечего
+            yield
+            return
+        for name in SCHEMA['trigger']:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    try:
+        yield
+    finally:
+        install(using)
+
+
+def match_expression(query):
+    """строка пользователя -> выражение MATCH: все слова, каждое
+    как префикс; кавычки и операторы FTS5 в слова не попадают"""
+    words = WORD.findall(query.replace('ё', 'е').replace('Ё', 'Е'))
+    return ' '.join(f'"{word}"*' for word in words[:MAX_TERMS])
+
+
+def filter_posts(queryset, query):
+    """посты queryset, подходящие под поисковую строку"""
+    words = WORD.findall(query)[:MAX_TERMS]
+    if not words:
+        return queryset.none()
+    if not available(queryset.db):
+        condition = Q()
+        for word in words:
+            condition &= Q(text__icontains=word)
+        return queryset.filter(condition)
+    # filter(id__in=RawSQL(...)) оборачивает подзапрос в лишние
+    # скобки, и SQLite сравнивает id только с первой строкой
+    return queryset.extra(
+        where=[f'"posts_post"."id" IN (SELECT rowid FROM {TABLE} '
+               f'WHERE {TABLE} MATCH %s)'],
+        params=[match_expression(query)],
+    )
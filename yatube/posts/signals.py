@@ -0,0 +1,134 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_migrate,
+                                      post_save)
+from django.dispatch import receiver
+
+from . import (counters, feed_cache, follow_graph, images, search,
+               thumbnails, timeline)
+from .models import Comment, Follow, Group, Post, UserStats
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    """новый пост попадает в ленты подписчиков автора"""
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def count_posts(sender, instance, created=False, **kwargs):
+    if created or kwargs['signal'] is post_delete:
+        counters.change(UserStats.objects.filter(user_id=instance.author_id),
+                        'posts_count', 1 if created else -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def count_comments(sender, instance, created=False, **kwargs):
+    if created or kwargs['signal'] is post_delete:
+        counters.change(Post.objects.filter(id=instance.post_id),
+                        'comment_count', 1 if created else -1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def count_follows(sender, instance, created=False, **kwargs):
+    if created or kwargs['signal'] is post_delete:
+        delta = 1 if created else -1
+        counters.change(UserStats.objects.filter(user_id=instance.author_id),
+                        'followers_count', delta)
+        counters.change(UserStats.objects.filter(user_id=instance.user_id),
+                        'following_count', delta)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_graph(sender, instance, **kwargs):
+    follow_graph.invalidate(instance.user_id)
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # группа до редактирования: пост нужно убрать и из её ленты
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    instance._loaded_image = instance.__dict__.get('image')
+
+
+@receiver(post_save, sender=Post)
+def process_image(sender, instance, created, **kwargs):
+    """варианты и миниатюра новой картинки создаются после загрузки,
+    варианты прежней картинки удаляются - раньше записи новых"""
+    name = instance.image.name or ''
+    loaded = instance._loaded_image or ''
+    if name == loaded:
+        return
+    # у нового поста здесь загруженный файл, а не прежнее имя
+    if loaded and not created:
+        transaction.on_commit(partial(images.delete_variants, loaded))
+    transaction.on_commit(partial(images.write_variants, instance.id, name))
+    if name:
+        transaction.on_commit(partial(thumbnails.pregenerate, name))
+    instance._loaded_image = name
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_feeds(sender, instance, **kwargs):
+    scopes = {'index', f'profile:{instance.author_id}',
+              f'post:{instance.id}'}
+    for group_id in (instance.group_id, instance._loaded_group_id):
+        if group_id:
+            scopes.add(f'group:{group_id}')
+    feed_cache.bump(*scopes)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_feeds(sender, instance, **kwargs):
+    # число комментариев видно и в лентах, где выводится пост
+    post = (Post.objects.filter(id=instance.post_id)
+            .values('author_id', 'group_id').first())
+    if post is None:
+        return
+    scopes = ['index', f'post:{instance.post_id}',
+              f'profile:{post["author_id"]}']
+    if post['group_id']:
+        scopes.append(f'group:{post["group_id"]}')
+    feed_cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_feeds(sender, instance, **kwargs):
+    feed_cache.bump('index', f'group:{instance.id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_feeds(sender, instance, **kwargs):
+    # в профилях обоих видны счётчики подписчиков и подписок
+    feed_cache.bump(f'follow:{instance.user_id}',
+                    f'profile:{instance.author_id}',
+                    f'profile:{instance.user_id}')
+
+
+@receiver(post_migrate)
+def repair_search_index(sender, using, **kwargs):
+    # триггеры поиска пропадают, если миграция перестроила posts_post
+    if sender.name == 'posts':
+        search.install(using, repair=True)
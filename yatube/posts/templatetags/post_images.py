@@ -0,0 +1,22 @@
+from django import template
+
+from .. import images, thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def image_srcset(post):
+    return images.srcset(post)
+
+
+@register.filter
+def image_variant(post, width):
+    return images.variant_url(post, int(width))
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """один запрос за миниатюрами страницы до цикла по постам"""
+    thumbnails.prefetch(posts)
+    return ''
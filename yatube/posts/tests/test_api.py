@@ -0,0 +1,124 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_init
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='ApiAuthor')
+        cls.reader = User.objects.create_user(username='ApiReader')
+        cls.group = Group.objects.create(title='Api', slug='api',
+                                         description='Api group')
+        cls.posts = [Post.objects.create(text=f'Api post {i}',
+                                         author=cls.author, group=cls.group)
+                     for i in range(15)]
+        Comment.objects.create(post=cls.posts[-1], author=cls.reader,
+                               text='Api comment')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds(self):
+        """ленты отдают посты в порядке лент без шаблонов"""
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', args=[self.group.slug]),
+            reverse('api:profile', args=[self.author.username]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response['Content-Type'],
+                                 'application/json')
+                first = response.json()['results'][0]
+                self.assertEqual(first['text'], 'Api post 14')
+                self.assertEqual(first['author'], self.author.username)
+                self.assertEqual(first['group'], self.group.slug)
+                self.assertEqual(first['comment_count'], 1)
+                self.assertIsNone(first['image'])
+
+    def test_no_models(self):
+        """строки сериализуются из values() без создания Post"""
+        created = []
+
+        def count(sender, **kwargs):
+            created.append(sender)
+
+        post_init.connect(count, sender=Post)
+        try:
+            self.client.get(reverse('api:index'))
+        finally:
+            post_init.disconnect(count, sender=Post)
+        self.assertEqual(created, [])
+
+    def test_sparse_fields(self):
+        """?fields= оставляет в ответе только названные поля"""
+        response = self.client.get(reverse('api:index'),
+                                   {'fields': 'id,text'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'text'})
+        response = self.client.get(reverse('api:index'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_cursor_pages(self):
+        """курсоры проходят ленту целиком без повторов"""
+        seen, data = [], {'limit': 4, 'fields': 'id'}
+        while True:
+            body = self.client.get(reverse('api:index'), data).json()
+            seen.extend(row['id'] for row in body['results'])
+            if body['next'] is None:
+                break
+            data['after'] = body['next']
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+
+    def test_etag(self):
+        """повторный запрос с If-None-Match получает 304 без запросов
+        к постам, новый пост меняет ETag"""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        Post.objects.create(text='Api fresh', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_detail(self):
+        """пост вместе с первой страницей комментариев"""
+        post = self.posts[-1]
+        body = self.client.get(reverse('api:post_detail',
+                                       args=[post.id])).json()
+        self.assertEqual(body['post']['text'], post.text)
+        self.assertEqual([comment['text']
+                          for comment in body['comments']['results']],
+                         ['Api comment'])
+        response = self.client.get(reverse('api:post_detail', args=[0]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_follow(self):
+        """лента подписок только для авторизованных"""
+        url = reverse('api:follow_index')
+        self.assertEqual(self.client.get(url).status_code,
+                         HTTPStatus.UNAUTHORIZED)
+        self.client.force_login(self.reader)
+        body = self.client.get(url).json()
+        self.assertEqual(len(body['results']), 10)
+        self.assertEqual(self.client.post(url).status_code,
+                         HTTPStatus.METHOD_NOT_ALLOWED)
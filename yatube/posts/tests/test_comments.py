@@ -0,0 +1,118 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+@override_settings(COMMENTS_PAGE_SIZE=5)
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='Commented')
+        cls.post = Post.objects.create(text='Commented post',
+                                       author=cls.author)
+        cls.readers = [User.objects.create_user(username=f'Reader{i}')
+                       for i in range(12)]
+        for i, reader in enumerate(cls.readers):
+            Comment.objects.create(post=cls.post, author=reader,
+                                   text=f'Comment {i}')
+        cls.url = reverse('posts:post_detail', args=[cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_first_page(self):
+        """на странице поста первые комментарии и ссылка на следующие"""
+        response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual([comment.text for comment in comments],
+                         [f'Comment {i}' for i in range(5)])
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, reverse('posts:comments',
+                                              args=[self.post.id]))
+        self.assertNotContains(response, '<p> Comment 5 </p>')
+
+    def test_fragment_pages(self):
+        """фрагменты по курсору проходят все комментарии по порядку"""
+        texts = []
+        url = reverse('posts:comments', args=[self.post.id])
+        data = {}
+        while True:
+            response = self.client.get(url, data, **AJAX)
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            self.assertTemplateNotUsed(response, 'base.html')
+            comments = response.context['comments']
+            texts.extend(comment.text for comment in comments)
+            if not comments.has_next():
+                break
+            data = {'after': comments.next_cursor}
+        self.assertEqual(texts, [f'Comment {i}' for i in range(12)])
+
+    def test_queries_fixed(self):
+        """авторы комментариев выбираются одним JOIN, без N+1"""
+        url = reverse('posts:comments', args=[self.post.id])
+        # сессия и пользователь попадают в кэш первым запросом
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as full:
+            self.client.get(url)
+        Comment.objects.filter(author__in=self.readers[1:]).delete()
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(url)
+        self.assertEqual(len(full), len(single))
+
+    def test_ajax_add_comment(self):
+        """AJAX-комментарий возвращается фрагментом без редиректа"""
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': 'Inline comment'}, **AJAX
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertTemplateUsed(response, 'posts/includes/comment.html')
+        self.assertContains(response, 'Inline comment',
+                            status_code=HTTPStatus.CREATED)
+        self.assertTrue(Comment.objects.filter(text='Inline comment')
+                        .exists())
+
+    def test_added_comment_in_next_pages(self):
+        """комментарий, добавленный при незагруженных страницах,
+        приходит по старому курсору последним и один раз"""
+        comments = self.client.get(self.url).context['comments']
+        self.client.post(reverse('posts:add_comment', args=[self.post.id]),
+                         {'text': 'Late comment'}, **AJAX)
+
+        texts = []
+        url = reverse('posts:comments', args=[self.post.id])
+        while comments.has_next():
+            comments = self.client.get(
+                url, {'after': comments.next_cursor}, **AJAX
+            ).context['comments']
+            texts.extend(comment.text for comment in comments)
+        self.assertEqual(texts, [f'Comment {i}' for i in range(5, 12)]
+                         + ['Late comment'])
+
+    def test_ajax_invalid_comment(self):
+        """ошибки формы возвращаются фрагментом формы"""
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': ''}, **AJAX
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertTemplateUsed(response, 'posts/includes/add_comment.html')
+
+    def test_missing_post(self):
+        response = self.client.get(reverse('posts:comments', args=[0]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
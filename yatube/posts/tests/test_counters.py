@@ -0,0 +1,85 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import counters
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        User.objects.create_user(username='Counted')
+        User.objects.create_user(username='CountedReader')
+
+    def setUp(self):
+        # свежие экземпляры: stats_for кэширует строку на объекте
+        self.user = User.objects.get(username='Counted')
+        self.reader = User.objects.get(username='CountedReader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_stats_created_with_recount(self):
+        """строка счётчиков создаётся с актуальными значениями"""
+        Post.objects.bulk_create(
+            [Post(text='Bulk', author=self.user)] * 3
+        )
+        self.assertEqual(counters.stats_for(self.user).posts_count, 3)
+
+    def test_signals_update_counters(self):
+        """создание и удаление строк сдвигает счётчики"""
+        counters.stats_for(self.user)
+        counters.stats_for(self.reader)
+
+        post = Post.objects.create(text='Counted post', author=self.user)
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Comment')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.stats(self.user).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+        post.delete()
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+
+    def test_edit_keeps_comment_count(self):
+        """сохранение устаревшего экземпляра не затирает счётчик"""
+        post = Post.objects.create(text='Edited', author=self.user)
+        Comment.objects.create(post=post, author=self.reader, text='New')
+
+        post.text = 'Edited again'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_reconcile_command(self):
+        """команда исправляет расхождение счётчиков"""
+        post = Post.objects.create(text='Drift', author=self.user)
+        counters.stats_for(self.user)
+        Post.objects.filter(id=post.id).update(comment_count=7)
+        UserStats.objects.filter(user=self.user).update(posts_count=9)
+
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=out)
+
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertIn('постов: 1, пользователей: 1', out.getvalue())
@@ -0,0 +1,87 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import follow_graph
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.reader = User.objects.create_user(username='GraphReader')
+        cls.authors = [User.objects.create_user(username=f'GraphAuthor{i}')
+                       for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_following_cached_sorted(self):
+        """подписки читаются одним запросом и дальше из кэша"""
+        for author in reversed(self.authors[:2]):
+            Follow.objects.create(user=self.reader, author=author)
+
+        with self.assertNumQueries(1):
+            ids = follow_graph.following_ids(self.reader.id)
+        self.assertEqual(list(ids), sorted(a.id for a in self.authors[:2]))
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(self.reader.id,
+                                                      self.authors[0].id))
+            self.assertFalse(follow_graph.is_following(self.reader.id,
+                                                       self.authors[2].id))
+
+    def test_invalidated_on_write(self):
+        """подписка и отписка сбрасывают закэшированный массив"""
+        author = self.authors[0]
+        self.assertFalse(follow_graph.is_following(self.reader.id,
+                                                   author.id))
+        follow_graph.follow(self.reader, author)
+        self.assertTrue(follow_graph.is_following(self.reader.id, author.id))
+        follow_graph.unfollow(self.reader, author)
+        self.assertFalse(follow_graph.is_following(self.reader.id,
+                                                   author.id))
+
+    def test_follow_idempotent(self):
+        """повторные подписка и отписка ничего не меняют"""
+        author = self.authors[1]
+        follow_url = reverse('posts:profile_follow', args=[author.username])
+        unfollow_url = reverse('posts:profile_unfollow',
+                               args=[author.username])
+
+        self.assertTrue(follow_graph.follow(self.reader, author))
+        self.assertFalse(follow_graph.follow(self.reader, author))
+        self.client.get(follow_url)
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 1)
+
+        self.client.get(unfollow_url)
+        response = self.client.get(unfollow_url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+
+    def test_constraints(self):
+        """база не допускает повторной подписки и подписки на себя"""
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        for author in (self.authors[2], self.reader):
+            with self.subTest(author=author):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(user=self.reader,
+                                              author=author)
+
+    def test_profile_uses_graph(self):
+        """страница автора показывает подписку из графа"""
+        author = self.authors[0]
+        Follow.objects.create(user=self.reader, author=author)
+        response = self.client.get(reverse('posts:profile',
+                                           args=[author.username]))
+        self.assertTrue(response.context['following'])
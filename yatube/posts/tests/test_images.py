@@ -0,0 +1,214 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from .. import images
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg_upload(size, name='photo.jpg', orientation=None):
+    image = Image.new('RGB', size, color=(200, 30, 30))
+    exif = Image.Exif()
+    exif[0x010F] = 'Phone maker'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+def frames_upload(size, image_format, name, **params):
+    frames = [Image.new('RGB', size, color=color)
+              for color in ((200, 30, 30), (30, 200, 30))]
+    buffer = BytesIO()
+    frames[0].save(buffer, image_format, save_all=True,
+                   append_images=frames[1:], **params)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=1000,
+                   IMAGE_VARIANT_WIDTHS=(480, 960, 1440))
+class ImagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear()
+
+    def test_normalize_caps_and_strips(self):
+        """картинка уменьшается, поворачивается и теряет EXIF"""
+        # ориентация 6: снимок повёрнут на 90 градусов
+        upload = images.normalize(jpeg_upload((1600, 1200), orientation=6))
+
+        image = Image.open(upload)
+        self.assertEqual(upload.name, 'photo.jpg')
+        self.assertEqual(image.size, (750, 1000))
+        self.assertNotIn('exif', image.info)
+
+    def test_normalize_frames(self):
+        """многокадровая не анимация уменьшается по первому кадру,
+        анимация остаётся как есть"""
+        upload = images.normalize(
+            frames_upload((1600, 1200), 'TIFF', 'scan.tiff')
+        )
+        image = Image.open(upload)
+        self.assertEqual(upload.name, 'scan.jpg')
+        self.assertEqual((image.format, image.size), ('JPEG', (1000, 750)))
+        self.assertGreater(image.getpixel((10, 10))[0], 150)
+
+        upload = frames_upload((1600, 1200), 'GIF', 'cat.gif', duration=100)
+        self.assertIs(images.normalize(upload), upload)
+        self.assertEqual(Image.open(upload).size, (1600, 1200))
+
+    def test_normalize_modes(self):
+        """TIFF в CMYK и float сохраняется в JPEG, а не падает на PNG"""
+        for mode, color in (('CMYK', (0, 200, 200, 0)), ('F', 200.0)):
+            with self.subTest(mode=mode):
+                buffer = BytesIO()
+                Image.new(mode, (1600, 1200), color).save(buffer, 'TIFF')
+                upload = images.normalize(
+                    SimpleUploadedFile('print.tif', buffer.getvalue())
+                )
+                image = Image.open(upload)
+                self.assertEqual(upload.name, 'print.jpg')
+                self.assertEqual((image.format, image.mode, image.size),
+                                 ('JPEG', 'RGB', (1000, 750)))
+
+        # LAB Pillow в RGB не переводит - ошибка формы, а не 500
+        buffer = BytesIO()
+        Image.new('LAB', (100, 100)).save(buffer, 'TIFF')
+        with self.assertRaises(ValidationError):
+            images.normalize(SimpleUploadedFile('lab.tif', buffer.getvalue()))
+
+    def test_form_accepts_cmyk_tiff(self):
+        client = Client()
+        client.force_login(self.user)
+        buffer = BytesIO()
+        Image.new('CMYK', (100, 100), (0, 200, 200, 0)).save(buffer, 'TIFF')
+        response = client.post(reverse('posts:post_create'), {
+            'text': 'Printed',
+            'image': SimpleUploadedFile('print.tif', buffer.getvalue()),
+        })
+        self.assertRedirects(response, reverse(
+            'posts:profile', args=[self.user.username]
+        ))
+        self.assertTrue(Post.objects.get(text='Printed').image.name
+                        .endswith('.jpg'))
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_normalize_rejects_large(self):
+        """слишком большая картинка отклоняется до декодирования"""
+        with self.assertRaises(ValidationError):
+            images.normalize(jpeg_upload((100, 100)))
+
+    def test_form_rejects_large(self):
+        """форма поста показывает ошибку вместо сохранения"""
+        client = Client()
+        client.force_login(self.user)
+        with self.settings(IMAGE_MAX_PIXELS=1000):
+            response = client.post(
+                reverse('posts:post_create'),
+                {'text': 'Huge', 'image': jpeg_upload((100, 100))},
+            )
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.filter(text='Huge').exists())
+
+    def test_variants_and_srcset(self):
+        """варианты пишутся по ширинам не больше оригинала"""
+        post = Post.objects.create(
+            text='Photo', author=self.user,
+            image=images.normalize(jpeg_upload((1000, 500))),
+        )
+        self.assertEqual(images.write_variants(post.id, post.image.name),
+                         [480, 960])
+
+        post = Post.objects.for_feed().get(id=post.id)
+        self.assertEqual(post.image_widths, '480,960')
+        for width in (480, 960):
+            name = images.variant_name(post.image.name, width)
+            self.assertTrue(default_storage.exists(name))
+            self.assertEqual(Image.open(default_storage.open(name)).size,
+                             (width, round(width * images.FEED_RATIO)))
+        self.assertIn('960w', images.srcset(post))
+
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'srcset=')
+
+    def test_variants_per_extension(self):
+        """photo.jpg и photo.png разных постов не делят варианты"""
+        jpg = Post.objects.create(
+            text='Jpeg', author=self.user,
+            image=images.normalize(jpeg_upload((1000, 500), 'same.jpg')),
+        )
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 500), (30, 30, 200)).save(buffer, 'PNG')
+        png = Post.objects.create(
+            text='Png', author=self.user,
+            image=SimpleUploadedFile('same.png', buffer.getvalue()),
+        )
+        images.write_variants(jpg.id, jpg.image.name)
+        images.write_variants(png.id, png.image.name)
+
+        jpg_variant = images.variant_name(jpg.image.name, 480)
+        self.assertNotEqual(jpg_variant,
+                            images.variant_name(png.image.name, 480))
+        red, _, blue = Image.open(default_storage.open(jpg_variant)
+                                  ).convert('RGB').getpixel((10, 10))
+        self.assertGreater(red, blue)
+
+    def test_missing_file(self):
+        """пост с пропавшим файлом остаётся без вариантов"""
+        post = Post.objects.create(text='Lost', author=self.user,
+                                   image='posts/lost.jpg')
+        self.assertEqual(images.write_variants(post.id, post.image.name), [])
+
+    def test_replaced_image_variants_removed(self):
+        """замена картинки удаляет варианты прежней"""
+        with patch('posts.signals.transaction.on_commit',
+                   side_effect=lambda callback: callback()):
+            post = Post.objects.create(
+                text='Replaced', author=self.user,
+                image=images.normalize(jpeg_upload((1000, 500), 'old.jpg')),
+            )
+            old = [images.variant_name(post.image.name, width)
+                   for width in (480, 960)]
+            self.assertTrue(all(map(default_storage.exists, old)))
+
+            post.image = images.normalize(jpeg_upload((500, 250), 'new.jpg'))
+            post.save()
+            self.assertFalse(any(map(default_storage.exists, old)))
+            self.assertTrue(default_storage.exists(
+                images.variant_name(post.image.name, 480)
+            ))
+
+            post.image = ''
+            post.save()
+            self.assertFalse(default_storage.exists(
+                images.variant_name('posts/new.jpg', 480)
+            ))
@@ -0,0 +1,102 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import jsonl, search
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class JsonlTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='Exported',
+                                              password='secret-pass')
+        cls.reader = User.objects.create_user(username='ExportReader')
+        cls.group = Group.objects.create(title='Exported group',
+                                         slug='exported',
+                                         description='Exported')
+        cls.post = Post.objects.create(text='Exported post',
+                                       author=cls.author, group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Exported comment')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        file, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(file)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def snapshot(self):
+        return {
+            'users': list(User.objects.order_by('id').values_list(
+                'id', 'username', 'password', 'date_joined')),
+            'posts': list(Post.objects.order_by('id').values_list(
+                'id', 'text', 'pub_date', 'author_id', 'group_id')),
+            'comments': list(Comment.objects.order_by('id').values_list(
+                'id', 'post_id', 'author_id', 'created')),
+            'follows': list(Follow.objects.values_list('user_id',
+                                                       'author_id')),
+        }
+
+    def test_round_trip(self):
+        """выгрузка и загрузка восстанавливают данные и производные"""
+        before = self.snapshot()
+        call_command('export_jsonl', self.path, stdout=StringIO())
+
+        for model in (Follow, Comment, Post, Group, UserStats, User):
+            model.objects.all().delete()
+        out = StringIO()
+        call_command('import_jsonl', self.path, batch_size=1, stdout=out)
+
+        self.assertEqual(self.snapshot(), before)
+        self.assertIn('posts.post: 1', out.getvalue())
+        self.assertEqual(Post.objects.get().comment_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post_id=self.post.id
+        ).exists())
+        self.assertTrue(User.objects.get(username='Exported')
+                        .check_password('secret-pass'))
+
+    def test_import_skips_existing(self):
+        """повторная загрузка не дублирует строки"""
+        call_command('export_jsonl', self.path, stdout=StringIO())
+        call_command('import_jsonl', self.path, skip_finalize=True,
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_import_leaves_models_alone(self):
+        """загрузка не трогает auto_now_add: посты, сохранённые
+        во время неё, получают дату; поиск находит загруженные посты"""
+        call_command('export_jsonl', self.path, stdout=StringIO())
+        Post.objects.all().delete()
+        saved = []
+
+        def lines():
+            with open(self.path, encoding='utf-8') as file:
+                for line in file:
+                    yield line
+                    if not saved:
+                        saved.append(Post.objects.create(
+                            text='Saved meanwhile', author=self.reader
+                        ))
+
+        jsonl.import_rows(lines(), batch_size=1)
+        self.assertIsNotNone(Post.objects.get(id=saved[0].id).pub_date)
+        self.assertEqual(Post.objects.get(id=self.post.id).pub_date,
+                         self.post.pub_date)
+        for text in ('Exported', 'meanwhile'):
+            with self.subTest(text=text):
+                self.assertEqual(
+                    search.filter_posts(Post.objects.all(), text).count(), 1
+                )
@@ -0,0 +1,110 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='PageCacheUser')
+        cls.group = Group.objects.create(
+            title='PageCacheGroup',
+            slug='PageCacheGroup',
+            description='PageCacheGroup for test',
+        )
+        cls.post = Post.objects.create(text='Page cache post',
+                                       author=cls.user, group=cls.group)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cached_response_and_304(self):
+        """повтор отдаётся из кэша без шаблонов,
+        запрос с If-None-Match получает 304"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                etag = response['ETag']
+                # правки и удаления не делают время монотонным
+                self.assertNotIn('Last-Modified', response)
+
+                response = self.guest_client.get(url)
+                self.assertIsNone(response.context)
+                self.assertEqual(response['ETag'], etag)
+                self.assertContains(response, self.post.text)
+
+                response = self.guest_client.get(url,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.content, b'')
+
+    def test_etag_changes_with_content(self):
+        """правка поста меняет ETag всех страниц с ним"""
+        etags = {url: self.guest_client.get(url)['ETag'] for url in self.urls}
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Edited page cache post'
+        post.save()
+
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertContains(response, 'Edited page cache post')
+
+    def test_etag_changes_on_delete(self):
+        """удаление нового поста возвращает ленту к старому виду,
+        но не к старому ETag"""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        newest = Post.objects.create(text='Deleted page cache post',
+                                     author=self.user)
+        self.assertContains(self.guest_client.get(url), newest.text)
+        newest.delete()
+
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotContains(response, newest.text)
+
+    def test_follow_changes_follower_profile(self):
+        """подписка обновляет счётчик подписок в профиле подписчика"""
+        follower = User.objects.create_user(username='PageCacheFollower')
+        url = reverse('posts:profile', kwargs={'username': follower})
+        self.assertContains(self.guest_client.get(url), 'подписок: 0')
+
+        Follow.objects.create(user=follower, author=self.user)
+
+        self.assertContains(self.guest_client.get(url), 'подписок: 1')
+
+    def test_keyed_on_query_string(self):
+        """разные страницы ленты кэшируются отдельно"""
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_authenticated_not_cached(self):
+        """авторизованным страницы не кэшируются целиком"""
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse('posts:index'))
+        response = client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
+        self.assertNotIn('ETag', response)
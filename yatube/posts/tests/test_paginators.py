@@ -0,0 +1,170 @@
+import base64
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+from ..paginators import CachedCountPaginator, CursorPaginator
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        # количество постов для трёх неполных страниц
+        cls.count_posts = settings.PAGINATOR_COUNT * 2 + 3
+
+        cls.user = User.objects.create_user(username='CursorUser')
+
+        # bulk_create даёт постам одинаковую дату публикации,
+        # поэтому порядок внутри даты держится только на id
+        Post.objects.bulk_create(
+            [Post(text=f'Cursor post {i}', author=cls.user)
+             for i in range(cls.count_posts)]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.paginator = CursorPaginator(Post.objects.all(),
+                                         settings.PAGINATOR_COUNT)
+
+    def test_walk_forward_and_back(self):
+        """проход по страницам вперёд и назад по курсорам"""
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+        first = self.paginator.get_page()
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        self.assertEqual(list(first), expected[:settings.PAGINATOR_COUNT])
+
+        second = self.paginator.get_page(after=first.next_cursor)
+        third = self.paginator.get_page(after=second.next_cursor)
+        self.assertFalse(third.has_next())
+        self.assertEqual(
+            list(first) + list(second) + list(third), expected
+        )
+
+        back = self.paginator.get_page(before=third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        back = self.paginator.get_page(before=back.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_page_without_count(self):
+        """страница по курсору стоит один запрос без COUNT(*)"""
+        cursor = self.paginator.get_page().next_cursor
+        with self.assertNumQueries(1):
+            page = self.paginator.get_page(after=cursor)
+            self.assertEqual(len(page), settings.PAGINATOR_COUNT)
+
+    def test_invalid_cursor(self):
+        """некорректный курсор возвращает первую страницу"""
+        first = self.paginator.get_page()
+        for token in ('', 'garbage', '!!!', 'WzFd'):
+            with self.subTest(token=token):
+                page = self.paginator.get_page(after=token)
+                self.assertEqual(list(page), list(first))
+
+    def test_tampered_cursor(self):
+        """курсор с чужими типами значений - первая страница, не 500"""
+        first = self.paginator.get_page()
+        shapes = ([None, None], [12345, 1], [{'a': 1}, 1], [[], 1],
+                  ['2020-01-01T00:00:00', 'x'], ['2020-01-01T00:00:00', [1]],
+                  ['2020-01-01T00:00:00', 2 ** 70])
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:comments', args=[Post.objects.first().id]),
+            reverse('api:index'),
+        )
+        for values in shapes:
+            token = base64.urlsafe_b64encode(json.dumps(values).encode())
+            token = token.decode().rstrip('=')
+            with self.subTest(values=values):
+                page = self.paginator.get_page(after=token)
+                self.assertEqual(list(page), list(first))
+                page = self.paginator.get_page(before=token)
+                self.assertEqual(list(page), list(first))
+                for url in urls:
+                    cache.clear()
+                    response = self.guest_client.get(
+                        url, {'after': token, 'comments_after': token}
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_views_cursor_mode(self):
+        """ленты переключаются на курсорную пагинацию по ?after="""
+        cursor = self.paginator.get_page().next_cursor
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.guest_client.get(url, {'after': cursor})
+                page_obj = response.context['page_obj']
+                self.assertTrue(page_obj.is_cursor)
+                self.assertEqual(len(page_obj), settings.PAGINATOR_COUNT)
+                self.assertContains(response, '?before=')
+                self.assertContains(response, '?after=')
+
+
+class CachedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='CountUser')
+        Post.objects.bulk_create(
+            [Post(text=f'Counted post {i}', author=cls.user)
+             for i in range(settings.PAGINATOR_COUNT * 3)]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_elided_page_range(self):
+        """длинный список страниц сворачивается с многоточиями"""
+        paginator = CachedCountPaginator(range(1000), 10)
+        ellipsis = CachedCountPaginator.ELLIPSIS
+        self.assertEqual(
+            list(paginator.get_elided_page_range(50)),
+            [1, 2, ellipsis, 47, 48, 49, 50, 51, 52, 53, ellipsis, 99, 100]
+        )
+        self.assertEqual(
+            list(paginator.get_elided_page_range(1)),
+            [1, 2, 3, 4, ellipsis, 99, 100]
+        )
+        self.assertEqual(
+            list(CachedCountPaginator(range(30), 10).page_range),
+            list(CachedCountPaginator(range(30), 10)
+                 .get_elided_page_range(2))
+        )
+
+    def test_count_cached_until_feed_changes(self):
+        """COUNT(*) выполняется один раз на поколение ленты"""
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                self.guest_client.get(reverse('posts:index') + '?page=2')
+            return sum('COUNT(' in query['sql']
+                       for query in context.captured_queries)
+
+        self.assertEqual(count_queries(), 1)
+        self.assertEqual(count_queries(), 0)
+
+        Post.objects.create(text='New post', author=self.user)
+        self.assertEqual(count_queries(), 1)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         settings.PAGINATOR_COUNT * 3 + 1)
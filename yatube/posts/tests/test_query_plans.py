@@ -0,0 +1,125 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import CursorPaginator
+
+User = get_user_model()
+
+# допустимы только строки плана SEARCH (поиск по индексу) и SCAN
+# из списков ниже: (строка плана, текст запроса); любой другой
+# SCAN, в том числе по покрывающему индексу, читает всю таблицу
+BOUNDED_SCANS = (
+    # SELECT без FROM
+    (re.compile(r'^SCAN CONSTANT ROW$'), re.compile('')),
+    # лента по дате: индекс уже в нужном порядке, чтение обрывает LIMIT
+    (re.compile(r'^SCAN posts_post USING INDEX post_pub_date_idx$'),
+     re.compile(r' LIMIT \d+')),
+)
+# полные проходы, результат которых кэшируется: допустимы только
+# при холодном кэше, повторный запрос их выполнять не должен
+CACHED_SCANS = (
+    # число постов ленты: CachedCountPaginator, раз на поколение ленты
+    (re.compile(r'^SCAN posts_post USING COVERING INDEX \w+$'),
+     re.compile(r'^SELECT COUNT\(\*\) AS "__count" FROM "posts_post"$')),
+    # популярные авторы: timeline.celebrity_ids,
+    # раз в TIMELINE_CELEBRITIES_TIMEOUT
+    (re.compile(r'^SCAN posts_follow USING COVERING INDEX \w+$'),
+     re.compile(r'GROUP BY "posts_follow"."author_id" HAVING COUNT')),
+)
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+class QueryPlanTests(TestCase):
+    """каждый SELECT, который выполняют вьюхи posts, прогоняется
+    через EXPLAIN QUERY PLAN: горячие запросы не должны читать
+    таблицу целиком или сортировать результат во временном B-дереве"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='PlannedAuthor')
+        cls.reader = User.objects.create_user(username='PlannedReader')
+        cls.group = Group.objects.create(title='Planned', slug='planned',
+                                         description='Planned group')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            post = Post.objects.create(text=f'Planned post {i}',
+                                       author=cls.author, group=cls.group)
+        for i in range(3):
+            comment = Comment.objects.create(post=post, author=cls.reader,
+                                             text=f'Planned comment {i}')
+        cls.post = post
+        cls.comment = comment
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def scans(self, url, data, allowed):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, data)
+        problems = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if TEMP_SORT.search(detail) or (
+                        detail.startswith('SCAN')
+                        and not any(plan.search(detail) and query.search(sql)
+                                    for plan, query in allowed)
+                    ):
+                        problems.append(f'{detail}\n    {sql}')
+        return problems
+
+    def bad_plans(self, url, data=None):
+        """планы запроса при холодном кэше и его повтора"""
+        cold = self.scans(url, data, BOUNDED_SCANS + CACHED_SCANS)
+        return cold + self.scans(url, data, BOUNDED_SCANS)
+
+    def test_feed_plans(self):
+        """ленты и страница поста читают только по индексам"""
+        urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'profile': reverse('posts:profile',
+                               args=[self.author.username]),
+            'post': reverse('posts:post_detail', args=[self.post.id]),
+            'follow': reverse('posts:follow_index'),
+        }
+        for name, url in urls.items():
+            for data in (None, {'page': 2}):
+                with self.subTest(view=name, data=data):
+                    self.assertEqual(self.bad_plans(url, data), [])
+
+    @override_settings(COMMENTS_PAGE_SIZE=1)
+    def test_comment_plans(self):
+        """страницы комментариев по курсору идут по индексу поста"""
+        url = reverse('posts:comments', args=[self.post.id])
+        after = CursorPaginator(
+            Comment.objects.all(), 1, ordering=('created', 'id')
+        ).encode(self.comment)
+        for data in (None, {'after': after}):
+            with self.subTest(data=data):
+                self.assertEqual(self.bad_plans(url, data), [])
+
+    def test_anonymous_plans(self):
+        """валидаторы кэша страниц тоже используют индексы"""
+        self.client.logout()
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=[self.group.slug]),
+                    reverse('posts:profile', args=[self.author.username]),
+                    reverse('posts:post_detail', args=[self.post.id])):
+            with self.subTest(url=url):
+                self.assertEqual(self.bad_plans(url), [])
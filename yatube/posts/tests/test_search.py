@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Searcher')
+        cls.post = Post.objects.create(
+            text='Ёжики гуляют по осеннему лесу', author=cls.user
+        )
+        Post.objects.create(text='Котики спят дома', author=cls.user)
+
+    def found(self, query):
+        return list(search.filter_posts(Post.objects.all(), query)
+                    .values_list('text', flat=True))
+
+    def test_prefix_and_folding(self):
+        """слова ищутся по префиксу, без учёта регистра и «ё»"""
+        self.assertEqual(self.found('ежик'), [self.post.text])
+        self.assertEqual(self.found('ОСЕНН лес'), [self.post.text])
+        self.assertEqual(self.found('ежик котик'), [])
+        self.assertEqual(self.found('"*'), [])
+
+    def test_index_follows_changes(self):
+        """триггеры обновляют индекс при изменении и удалении"""
+        Post.objects.filter(id=self.post.id).update(text='Белки в парке')
+        self.assertEqual(self.found('ежик'), [])
+        self.assertEqual(self.found('белк'), ['Белки в парке'])
+
+        Post.objects.bulk_create([Post(text='Белки на даче',
+                                       author=self.user)])
+        self.assertEqual(len(self.found('белк')), 2)
+
+        Post.objects.filter(text='Белки на даче').delete()
+        self.assertEqual(self.found('белк'), ['Белки в парке'])
+
+    def test_repair_restores_triggers(self):
+        """пропавшие триггеры восстанавливаются с пересборкой индекса"""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {search.TABLE}_insert')
+        Post.objects.create(text='Незамеченные еноты', author=self.user)
+        self.assertEqual(self.found('енот'), [])
+
+        self.assertTrue(search.install(repair=True))
+        self.assertEqual(self.found('енот'), ['Незамеченные еноты'])
+
+    def test_search_view(self):
+        """страница поиска разбивает результаты и сохраняет запрос"""
+        Post.objects.bulk_create(
+            [Post(text=f'Котики номер {i}', author=self.user)
+             for i in range(settings.PAGINATOR_COUNT)]
+        )
+        response = Client().get(reverse('posts:search'), {'q': 'котик'})
+
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count,
+                         settings.PAGINATOR_COUNT + 1)
+        self.assertEqual(len(page_obj), settings.PAGINATOR_COUNT)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82%D0%B8%D0%BA'
+                                      '&amp;page=2')
+
+    def test_admin_search(self):
+        """поиск в админке идёт через полнотекстовый индекс"""
+        admin = User.objects.create_superuser('SearchAdmin', 'a@a.ru', 'pw')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'ежик'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.post])
@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.helpers import tokey
+
+from .. import thumbnails
+from ..kvstore import KVStore
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_LOCK_TIMEOUT=0.3,
+                   THUMBNAIL_LOCK_POLL=0.05)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # kvstore миниатюр хранится и в кэше, а база откатывается
+        cache.clear()
+        default.kvstore.clear()
+        self.post = Post.objects.create(
+            text='With image',
+            author=self.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif'),
+        )
+        self.state = os.path.join(TEMP_MEDIA_ROOT, 'thumbnails.state')
+
+    def feed_thumbnail(self):
+        backend = thumbnails.LockingThumbnailBackend()
+        return backend._thumbnail_file(self.post.image.name,
+                                       thumbnails.FEED_GEOMETRY,
+                                       thumbnails.FEED_OPTIONS)
+
+    def test_command_pregenerates(self):
+        """команда создаёт миниатюры и запоминает последний id"""
+        out = StringIO()
+        call_command('pregenerate_thumbnails', workers=0, restart=True,
+                     state=self.state, stdout=out)
+
+        thumbnail = default.kvstore.get(self.feed_thumbnail())
+        self.assertIsNotNone(thumbnail)
+        self.assertTrue(thumbnail.exists())
+        self.assertIn('миниатюр: 1', out.getvalue())
+        with open(self.state) as state:
+            self.assertEqual(state.read(), str(self.post.id))
+
+    def test_command_resumes(self):
+        """повторный запуск пропускает обработанные посты"""
+        with open(self.state, 'w') as state:
+            state.write(str(self.post.id))
+        out = StringIO()
+        call_command('pregenerate_thumbnails', workers=0,
+                     state=self.state, stdout=out)
+
+        self.assertIn('миниатюр: 0', out.getvalue())
+        self.assertIsNone(default.kvstore.get(self.feed_thumbnail()))
+
+    def test_template_uses_pregenerated(self):
+        """шаблонный вызов находит заранее созданную миниатюру"""
+        pregenerated = thumbnails.pregenerate(self.post.image.name)
+        thumbnail = get_thumbnail(self.post.image, thumbnails.FEED_GEOMETRY,
+                                  **thumbnails.FEED_OPTIONS)
+        self.assertEqual(thumbnail.name, pregenerated.name)
+
+    def test_lock_timeout(self):
+        """зависшая блокировка не мешает создать миниатюру"""
+        lock = 'thumbnail-lock:' + tokey(
+            self.feed_thumbnail().name
+        )
+        cache.add(lock, 1, 60)
+        thumbnail = thumbnails.pregenerate(self.post.image.name)
+        self.assertTrue(thumbnail.exists())
+        self.assertTrue(cache.has_key(lock))
+
+    def test_prefetch_single_query(self):
+        """записи страницы загружаются одним запросом к базе"""
+        thumbnails.pregenerate(self.post.image.name)
+        other = Post.objects.create(
+            text='Another image', author=self.user,
+            image=SimpleUploadedFile('other.gif', SMALL_GIF,
+                                     content_type='image/gif'),
+        )
+        thumbnails.pregenerate(other.image.name)
+        cache.clear()
+
+        store = KVStore()
+        with patch.object(default, 'kvstore', store):
+            with self.assertNumQueries(1):
+                thumbnails.prefetch([self.post, other])
+            with self.assertNumQueries(0):
+                thumbnails.pregenerate(other.image.name)
+                thumbnails.pregenerate(self.post.image.name)
+
+    @override_settings(THUMBNAIL_LOCAL_SIZE=1)
+    def test_local_lru_bounded(self):
+        """локальный LRU хранит не больше THUMBNAIL_LOCAL_SIZE записей"""
+        store = KVStore()
+        store._set_raw('first', 'value')
+        store._set_raw('second', 'value')
+        self.assertEqual(list(store._local), ['second'])
@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.other = User.objects.create_user(username='Other')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def feed_ids(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return [post.id for post in response.context['page_obj']]
+
+    def test_fan_out_on_create(self):
+        """новый пост раскладывается в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Fan out', author=self.author)
+        Post.objects.create(text='Not followed', author=self.other)
+
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    def test_backfill_and_trim(self):
+        """подписка добавляет старые посты автора, отписка убирает"""
+        post = Post.objects.create(text='Before follow', author=self.author)
+
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author})
+        )
+        self.assertEqual(self.feed_ids(), [post.id])
+
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.author})
+        )
+        self.assertEqual(self.feed_ids(), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_merged_on_read(self):
+        """посты популярного автора не раскладываются,
+        а подмешиваются в ленту при чтении"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        post = Post.objects.create(text='Celebrity', author=self.author)
+
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_threshold_crossed(self):
+        """автор становится популярным и перестаёт им быть -
+        в ленте остаются все его посты, а раскладывает их команда"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        before = Post.objects.create(text='Before', author=self.author)
+
+        Follow.objects.create(user=self.other, author=self.author)
+        cache.delete(timeline.CELEBRITIES_CACHE_KEY)
+        self.assertIn(self.author.id, timeline.celebrity_ids())
+        during = Post.objects.create(text='During', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=during).exists())
+        self.assertEqual(self.feed_ids(), [during.id, before.id])
+
+        Follow.objects.filter(user=self.other).delete()
+        cache.delete(timeline.CELEBRITIES_CACHE_KEY)
+        self.assertNotIn(self.author.id, timeline.celebrity_ids())
+        self.assertFalse(TimelineEntry.objects.filter(post=during).exists())
+        self.assertEqual(self.feed_ids(), [during.id, before.id])
+
+        call_command('rebuild_timelines', '--backfill-only',
+                     stdout=StringIO())
+        self.assertEqual(timeline.pending_backfill(), set())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=during
+        ).exists())
+        after = Post.objects.create(text='After', author=self.author)
+        cache.clear()
+        self.assertEqual(self.feed_ids(), [after.id, during.id, before.id])
+
+    def test_rebuild_command(self):
+        """команда восстанавливает потерянные записи ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        # bulk_create не отправляет сигналы, лента остаётся пустой
+        Post.objects.bulk_create(
+            [Post(text=f'Bulk {i}', author=self.author) for i in range(3)]
+        )
+        self.assertEqual(timeline.feed(self.reader).count(), 0)
+
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            set(timeline.feed(self.reader).values_list('id', flat=True)),
+            set(self.author.posts.values_list('id', flat=True))
+        )
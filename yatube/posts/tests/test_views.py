@@ -3,7 +3,9 @@ from django import forms
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 
@@ -188,6 +190,27 @@ class PostsPagesTests(TestCase):
         self.assertEqual(len(response.context['page_obj']),
                          self.count_post_author - settings.PAGINATOR_COUNT)
 
+    def test_feed_markup(self):
+        """все ленты рисуют посты одной разметкой: шаблон поста
+        с числом комментариев, ссылка на группу - на общих лентах"""
+        urls = {
+            reverse('posts:index'): True,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}):
+                False,
+            reverse('posts:profile', kwargs={'username': self.user}): False,
+        }
+        for url, show_group in urls.items():
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.authorized_client.get(url)
+                content = response.content.decode()
+                self.assertEqual(content.count('Всего комментариев'),
+                                 settings.PAGINATOR_COUNT)
+                self.assertEqual(content.count('<hr>'),
+                                 settings.PAGINATOR_COUNT - 1)
+                self.assertEqual('все записи группы -' in content,
+                                 show_group)
+
 
 class PostsCacheTests(TestCase):
     """тестрирование кэша"""
@@ -215,21 +238,34 @@ class PostsCacheTests(TestCase):
         # запрос на страницу с новой записью
         self.guest_client.get(reverse('posts:index'))
 
-        # удаление поста
-        self.post.delete()
-
-        """получение запроса на главной странице
-        с уже удаленной записью из базы данных"""
+        """изменение записи в обход моделей не меняет поколение ленты,
+        поэтому страница берётся из кэша"""
+        Post.objects.filter(id=self.post.id).update(text='Silent change')
         response = self.guest_client.get(reverse('posts:index'))
 
         # проверка, что кэш работает
         self.assertIn(self.post.text, response.content.decode('utf-8'))
 
-        """очистка кэша и проверка, что удаленной
-        записи нет на главной странице"""
-        cache.clear()
+        """удаление поста сбрасывает поколение ленты,
+        и удаленной записи сразу нет на главной странице"""
+        self.post.delete()
         response = self.guest_client.get(reverse('posts:index'))
         self.assertNotIn(self.post.text, response.content.decode('utf-8'))
+        self.assertNotIn('Silent change', response.content.decode('utf-8'))
+
+    def test_cache_invalidated_by_comment(self):
+        """новый комментарий сразу виден на странице поста и в ленте"""
+        post = Post.objects.get(author=self.user)
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        self.guest_client.get(url)
+        self.guest_client.get(reverse('posts:index'))
+
+        post.comments.create(author=self.user, text='Fresh comment')
+
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Fresh comment')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Всего комментариев: 1')
 
 
 class FollowPagesTests(TestCase):
@@ -313,10 +349,6 @@ class FollowPagesTests(TestCase):
             text='Post of Author',
             author=self.user_author
         )
-        Follow.objects.create(
-            user=self.user_follower,
-            author=self.user_author
-        )
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), 1)
 
@@ -332,3 +364,57 @@ class FollowPagesTests(TestCase):
 
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), 0)
+
+
+class FeedQueriesTests(TestCase):
+    """число запросов ленты не зависит от числа постов на странице"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='FeedAuthor',
+                                            first_name='Feed',
+                                            last_name='Author')
+        cls.group = Group.objects.create(
+            title='FeedGroup',
+            slug='FeedGroup',
+            description='FeedGroup for test',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        Follow.objects.create(user=self.user,
+                              author=User.objects.create_user('Followed'))
+
+    def get_queries(self, url):
+        # первый запрос создаёт строки счётчиков, его не учитываем
+        self.authorized_client.get(url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        return len(context.captured_queries)
+
+    def test_feed_queries_fixed(self):
+        """страница из одного поста и из полной страницы
+        стоит одинаковое число запросов"""
+        followed = User.objects.get(username='Followed')
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': followed}),
+            reverse('posts:follow_index'),
+        )
+        post = Post.objects.create(text='Single', author=followed,
+                                   group=self.group)
+        single = {url: self.get_queries(url) for url in urls}
+
+        for i in range(settings.PAGINATOR_COUNT):
+            Post.objects.create(text=f'Feed {i}', author=followed,
+                                group=self.group)
+        post.comments.create(text='Comment', author=self.user)
+
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.get_queries(url), single[url])
@@ -0,0 +1,83 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import tokey
+from sorl.thumbnail.images import ImageFile
+
+from core import instrumentation
+
+
+# миниатюра ленты и страницы поста - те же параметры, что в шаблонах
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def pregenerate(image):
+    """создаёт миниатюру ленты заранее, чтобы её не пришлось
+    генерировать первому читателю поста"""
+    if image:
+        return get_thumbnail(image, FEED_GEOMETRY, **FEED_OPTIONS)
+
+
+def prefetch(posts):
+    """метаданные миниатюр ленты для всех постов страницы разом"""
+    kvstore = default.kvstore
+    if not hasattr(kvstore, 'prefetch'):
+        return
+    backend = LockingThumbnailBackend()
+    kvstore.prefetch([
+        backend._thumbnail_file(post.image, FEED_GEOMETRY, FEED_OPTIONS)
+        for post in posts if post.image
+    ])
+
+
+class LockingThumbnailBackend(ThumbnailBackend):
+    """миниатюру, которой ещё нет, генерирует один процесс:
+    остальные запросы ждут её появления под блокировкой в общем кэше"""
+
+    def _thumbnail_file(self, file_, geometry_string, options):
+        # то же имя, что вычисляет ThumbnailBackend.get_thumbnail
+        source = ImageFile(file_)
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        thumbnail = self._thumbnail_file(file_, geometry_string, options)
+        cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+
+        lock = 'thumbnail-lock:' + tokey(thumbnail.name)
+        timeout = settings.THUMBNAIL_LOCK_TIMEOUT
+        deadline = time.monotonic() + timeout
+        acquired = cache.add(lock, 1, timeout)
+        while not acquired and time.monotonic() < deadline:
+            # миниатюру генерирует другой запрос - ждём результата
+            time.sleep(settings.THUMBNAIL_LOCK_POLL)
+            cached = default.kvstore.get(thumbnail)
+            if cached:
+                return cached
+            acquired = cache.add(lock, 1, timeout)
+        try:
+            with instrumentation.timer('thumbnail'):
+                return super().get_thumbnail(file_, geometry_string,
+                                             **options)
+        finally:
+            if acquired:
+                cache.delete(lock)
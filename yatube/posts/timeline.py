@@ -0,0 +1,148 @@
+"""материализованная лента подписок: посты раскладываются
+по лентам подписчиков при публикации, посты популярных авторов
+подмешиваются при чтении"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from . import follow_graph
+from .models import Follow, Post, TimelineEntry
+
+
+CELEBRITIES_CACHE_KEY = 'timeline:celebrities'
+# прежний состав популярных авторов, без срока жизни: по нему видно,
+# кто перестал быть популярным с прошлого пересчёта
+KNOWN_CELEBRITIES_CACHE_KEY = 'timeline:celebrities:known'
+# выбывшие из популярных, чьи посты ещё не разложены по лентам
+PENDING_BACKFILL_CACHE_KEY = 'timeline:backfill'
+
+
+def celebrity_ids():
+    """авторы, у которых подписчиков больше TIMELINE_FANOUT_LIMIT;
+    выбывшие из них ждут rebuild_timelines в pending_backfill"""
+    ids = cache.get(CELEBRITIES_CACHE_KEY)
+    if ids is None:
+        ids = set(
+            Follow.objects.values('author')
+            .annotate(followers=Count('id'))
+            .filter(followers__gt=settings.TIMELINE_FANOUT_LIMIT)
+            .values_list('author', flat=True)
+        )
+        known = cache.get(KNOWN_CELEBRITIES_CACHE_KEY)
+        cache.set(CELEBRITIES_CACHE_KEY, ids,
+                  settings.TIMELINE_CELEBRITIES_TIMEOUT)
+        cache.set(KNOWN_CELEBRITIES_CACHE_KEY, ids, None)
+        # без прежнего состава (кэш очищен) переход не виден -
+        # ленты восстанавливает полный rebuild_timelines
+        pending = pending_backfill()
+        if (known or set()) - ids or pending & ids:
+            cache.set(PENDING_BACKFILL_CACHE_KEY,
+                      (pending | (known or set())) - ids, None)
+    return ids
+
+
+def pending_backfill():
+    """авторы, чьи посты до backfill_author подмешиваются при чтении"""
+    return cache.get(PENDING_BACKFILL_CACHE_KEY) or set()
+
+
+def backfill_pending():
+    """раскладывает посты выбывших из популярных,
+    возвращает число обработанных авторов"""
+    done = pending_backfill()
+    for author_id in done:
+        with transaction.atomic():
+            backfill_author(author_id)
+    if done:
+        cache.set(PENDING_BACKFILL_CACHE_KEY, pending_backfill() - done,
+                  None)
+    return len(done)
+
+
+def _save_entries(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """раскладывает новый пост по лентам подписчиков автора"""
+    if post.author_id in celebrity_ids():
+        return
+    followers = (Follow.objects.filter(author_id=post.author_id)
+                 .values_list('user_id', flat=True).iterator())
+    _save_entries(
+        TimelineEntry(user_id=user_id, post_id=post.id,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers
+    )
+
+
+def backfill(user_id, author_id):
+    """добавляет посты автора в ленту нового подписчика"""
+    if author_id in celebrity_ids():
+        return
+    posts = (Post.objects.filter(author_id=author_id).order_by()
+             .values_list('id', 'pub_date').iterator())
+    _save_entries(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    )
+
+
+def backfill_author(author_id):
+    """автор больше не популярен: его посты, не разложенные при
+    публикации и подписке, добавляются в ленты всех подписчиков"""
+    followers = list(Follow.objects.filter(author_id=author_id)
+                     .values_list('user_id', flat=True))
+    posts = (Post.objects.filter(author_id=author_id).order_by()
+             .values_list('id', 'pub_date').iterator())
+    _save_entries(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+        for user_id in followers
+    )
+
+
+def trim(user_id, author_id):
+    """убирает посты автора из ленты отписавшегося"""
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """пересобирает ленту пользователя по его подпискам"""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = (Follow.objects.filter(user_id=user_id)
+               .exclude(author_id__in=celebrity_ids())
+               .values('author_id'))
+    posts = (Post.objects.filter(author_id__in=authors).order_by()
+             .values_list('id', 'author_id', 'pub_date').iterator())
+    _save_entries(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, author_id, pub_date in posts
+    )
+
+
+def feed(user):
+    """посты ленты подписок: материализованные записи
+    плюс посты популярных авторов, подмешанные при чтении"""
+    merged = celebrity_ids() | pending_backfill()
+    followed = [author_id
+                for author_id in follow_graph.following_ids(user.id)
+                if author_id in merged]
+    if not followed:
+        # порядок берётся из индекса (user, -pub_date) записей ленты,
+        # посты читаются по первичному ключу без сортировки
+        return (Post.objects.filter(timeline_entries__user=user)
+                .order_by('-timeline_entries__pub_date'))
+    posts = Post.objects.filter(
+        id__in=TimelineEntry.objects.filter(user=user).values('post_id')
+    )
+    return posts | Post.objects.filter(author_id__in=followed)
@@ -1,64 +1,122 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, render, redirect
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
 
+from . import counters, feed_cache, follow_graph, search, timeline
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Comment, Group, Post
+from .page_cache import (anonymous_page_cache, group_validators,
+                         index_validators, post_validators,
+                         profile_validators)
+from .paginators import CachedCountPaginator, CursorPaginator
 
 
 User = get_user_model()
 
 
-def page_paginator(data, request):
-    """функция разделения записей на несколько страниц"""
-    post_list = Paginator(data, settings.PAGINATOR_COUNT)
+def page_paginator(data, request, count_key=None):
+    """функция разделения записей на несколько страниц
+    при PAGINATOR_MODE = 'cursor' или переданных ?after=/?before=
+    включается курсорная пагинация по (pub_date, id);
+    count_key - ключ кэша для числа записей нумерованной ленты"""
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if settings.PAGINATOR_MODE == 'cursor' or after or before:
+        post_list = CursorPaginator(data, settings.PAGINATOR_COUNT)
+        return post_list.get_page(after=after, before=before)
+
+    post_list = CachedCountPaginator(data, settings.PAGINATOR_COUNT,
+                                     count_key=count_key)
     page_number = request.GET.get('page')
 
     return post_list.get_page(page_number)
 
 
+def comments_page(post_id, request):
+    """страница комментариев после курсора ?after= в порядке
+    написания; выбирается лениво, только если фрагмент шаблона
+    не нашёлся в кэше"""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('text', 'created', 'post_id', 'author__username')
+    paginator = CursorPaginator(comments, settings.COMMENTS_PAGE_SIZE,
+                                ordering=('created', 'id'))
+    return SimpleLazyObject(
+        lambda: paginator.get_page(after=request.GET.get('after'))
+    )
+
+
+@anonymous_page_cache(index_validators)
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.all()
+    posts = Post.objects.for_feed()
+    feed = feed_cache.context('index')
 
-    page_obj = page_paginator(posts, request)
+    page_obj = page_paginator(posts, request, feed['cache_version'])
     context = {'page_obj': page_obj}
+    context.update(feed)
 
     return render(request, template, context)
 
 
+@anonymous_page_cache(group_validators)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
 
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_feed()
+    feed = feed_cache.context(f'group:{group.id}')
 
-    page_obj = page_paginator(posts, request)
+    page_obj = page_paginator(posts, request, feed['cache_version'])
     context = {
         'group': group,
         'page_obj': page_obj
     }
+    context.update(feed)
     return render(request, template, context)
 
 
+@anonymous_page_cache(profile_validators)
 def profile(request, username):
     template = 'posts/profile.html'
 
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = page_paginator(posts, request)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    stats = counters.stats_for(author)
+    posts = author.posts.for_feed()
+    feed = feed_cache.context(f'profile:{author.id}')
+    page_obj = page_paginator(posts, request, feed['cache_version'])
 
     # проверка является ли текущий юзер анонимным или нет
     following = (request.user.is_authenticated
-                 and author.following.filter(user=request.user).exists())
+                 and follow_graph.is_following(request.user.id, author.id))
     context = {
         'author': author,
         'page_obj': page_obj,
-        'count_post_author': author.posts.count(),
+        'count_post_author': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
         'following': following
     }
+    context.update(feed)
+    return render(request, template, context)
+
+
+def search_posts(request):
+    template = 'posts/search.html'
+
+    query = request.GET.get('q', '').strip()
+    posts = search.filter_posts(Post.objects.for_feed(), query)
+    page_obj = page_paginator(posts, request)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        # ссылки пагинатора сохраняют поисковую строку
+        'page_query': urlencode({'q': query}) + '&',
+    }
     return render(request, template, context)
 
 
@@ -73,23 +131,51 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        if request.is_ajax():
+            # скрипт страницы поста вставляет только новый комментарий
+            return render(request, 'posts/includes/comment.html',
+                          {'comment': comment}, status=201)
+    elif request.is_ajax():
+        return render(request, 'posts/includes/add_comment.html',
+                      {'post': post, 'form': form}, status=400)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@anonymous_page_cache(post_validators)
+def post_comments(request, post_id):
+    """следующая страница комментариев фрагментом HTML"""
+    template = 'posts/includes/comments.html'
+
+    get_object_or_404(Post.objects.only('id'), id=post_id)
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(post_id, request),
+    }
+    return render(request, template, context)
+
+
+@anonymous_page_cache(post_validators)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
 
-    post = get_object_or_404(Post, id=post_id)
-    count_post_author = post.author.posts.count()
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
+    count_post_author = counters.stats_for(post.author).posts_count
 
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
         'count_post_author': count_post_author,
-        'comments': comments,
+        'post_id': post.id,
+        'comments': comments_page(post.id, request),
+        'comments_cursor': request.GET.get('after', ''),
         'form': form
     }
+    context.update(feed_cache.context(
+        f'post:{post.id}', f'profile:{post.author_id}',
+        f'group:{post.group_id}'
+    ))
     return render(request, template, context)
 
 
@@ -132,15 +218,13 @@ def post_edit(request, post_id):
 def follow_index(request):
     template = 'posts/follow.html'
 
-    # получение авторов на которых подписан авторизованный юзер
-    user = get_object_or_404(User, username=request.user)
-    followers = user.follower.all().values('author')
+    # материализованная лента подписок авторизованного юзера
+    posts = timeline.feed(request.user).for_feed()
+    feed = feed_cache.context('index', f'follow:{request.user.id}')
 
-    # получение постов вышеполученных авторов
-    posts = Post.objects.filter(author__in=followers)
-
-    page_obj = page_paginator(posts, request)
+    page_obj = page_paginator(posts, request, feed['cache_version'])
     context = {'page_obj': page_obj}
+    context.update(feed)
 
     return render(request, template, context)
 
@@ -149,12 +233,8 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
 
-    if request.user.username == username:
-        return redirect('posts:profile', username)
-
-    if not author.following.filter(user=request.user).exists():
-        Follow.objects.create(user=request.user,
-                              author=author)
+    # подписка на себя и повторная подписка ничего не меняют
+    follow_graph.follow(request.user, author)
 
     return redirect('posts:profile', username)
 
@@ -163,7 +243,6 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
 
-    follow = Follow.objects.get(user=request.user, author=author)
-    follow.delete()
+    follow_graph.unfollow(request.user, author)
 
     return redirect('posts:profile', username)
@@ -0,0 +1,55 @@
+"""пользователь запроса из общего кэша
+
+AuthenticationMiddleware на каждый запрос читает строку сессии и
+строку auth_user; сессии хранятся в cached_db, а пользователь - здесь,
+под ключом по id на AUTH_USER_CACHE_TIMEOUT секунд. Хэш пароля из
+сессии сверяется и с закэшированным пользователем, поэтому смена
+пароля завершает остальные сессии так же, как без кэша; сигналы
+users.signals сбрасывают запись при сохранении пользователя и выходе"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def _key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def invalidate(user_id):
+    cache.delete(_key(user_id))
+
+
+def get_user(request):
+    session = request.session
+    user_id = session.get(auth.SESSION_KEY)
+    backend_path = session.get(auth.BACKEND_SESSION_KEY)
+    if (user_id is None
+            or backend_path not in settings.AUTHENTICATION_BACKENDS):
+        return auth.get_user(request)
+    user = cache.get(_key(user_id))
+    if user is None:
+        # полная проверка Django; в кэш - только вошедший пользователь
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache.set(_key(user_id), user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(
+            session_hash, user.get_session_auth_hash())):
+        session.flush()
+        return AnonymousUser()
+    user.backend = backend_path
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        assert hasattr(request, 'session'), (
+            'CachedAuthenticationMiddleware requires SessionMiddleware '
+            'before it in MIDDLEWARE.'
+        )
+        request.user = SimpleLazyObject(lambda: get_user(request))
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import middleware
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """смена пароля, имени, is_active и вход (last_login) сбрасывают
+    запись; после коммита - чтобы параллельный запрос не вернул в кэш
+    строку до сохранения"""
+    middleware.invalidate(instance.id)
+    transaction.on_commit(lambda: middleware.invalidate(instance.id))
+
+
+@receiver(user_logged_out)
+def invalidate_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        middleware.invalidate(user.id)
@@ -1,3 +1,78 @@
-# from django.test import TestCase
+from http import HTTPStatus
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .middleware import _key
+
+User = get_user_model()
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Cached',
+                                             password='old-Pass-123')
+        self.client = Client()
+        self.client.login(username='Cached', password='old-Pass-123')
+        self.url = reverse('users:password_change_form')
+
+    def auth_queries(self):
+        """запросы к сессии и строке пользователя по id"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [query['sql'] for query in queries
+                if 'django_session' in query['sql']
+                or 'FROM "auth_user" WHERE "auth_user"."id"' in query['sql']]
+
+    def test_no_auth_queries(self):
+        """со второго запроса сессия и пользователь берутся из кэша"""
+        self.auth_queries()
+        self.assertEqual(self.auth_queries(), [])
+        self.assertEqual(cache.get(_key(self.user.id)), self.user)
+
+    def test_save_invalidates(self):
+        self.auth_queries()
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['user'].first_name, 'Renamed')
+
+    def test_password_change_ends_other_sessions(self):
+        """смена пароля в одной сессии завершает закэшированные другие"""
+        other = Client()
+        other.login(username='Cached', password='old-Pass-123')
+        other.get(self.url)
+        response = self.client.post(self.url, {
+            'old_password': 'old-Pass-123',
+            'new_password1': 'new-Pass-456',
+            'new_password2': 'new-Pass-456',
+        })
+        self.assertRedirects(response,
+                             reverse('users:password_change_done'))
+        self.assertEqual(self.client.get(self.url).status_code,
+                         HTTPStatus.OK)
+        response = other.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_stale_entry_checks_session_hash(self):
+        """и устаревшая запись в кэше не пускает со старым паролем"""
+        self.auth_queries()
+        stale = cache.get(_key(self.user.id))
+        self.user.set_password('new-Pass-456')
+        self.user.save()
+        # запись вернулась в кэш уже с новым паролем, до сброса сессии
+        stale.password = self.user.password
+        cache.set(_key(self.user.id), stale)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_logout_invalidates(self):
+        self.auth_queries()
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(_key(self.user.id)))
@@ -36,20 +36,26 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.CachedAuthenticationMiddleware',
+    'core.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar только для разработки
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 # for django_debug_toolbar
 INTERNAL_IPS = [
     '127.0.0.1',
@@ -84,9 +90,24 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # соединение живёт между запросами потока
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
     }
 }
 
+# применяются к каждому новому соединению (core.signals): WAL не даёт
+# записи блокировать чтение, synchronous=NORMAL в WAL не теряет
+# целостность, busy_timeout ждёт блокировку вместо ошибки
+# "database is locked"; порядок важен - busy_timeout первым
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -126,9 +147,26 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+# collectstatic собирает сюда файлы с хэшем в имени и сжатыми
+# копиями, StaticFilesMiddleware раздаёт их сам (STATIC_SERVE);
+# файлы без хэша кэшируются на STATIC_MAX_AGE секунд
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATIC_SERVE = True
+STATIC_MAX_AGE = 60
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# медиа отдаёт core.views.serve_media, только из этих каталогов:
+# картинки постов и их варианты, миниатюры sorl-thumbnail;
+# MEDIA_SERVE_MODE: 'python' - FileResponse (sendfile через
+# wsgi.file_wrapper сервера), 'x-accel' - X-Accel-Redirect на
+# internal location nginx MEDIA_ACCEL_PREFIX, 'x-sendfile' - X-Sendfile
+MEDIA_SERVE_PREFIXES = ('posts/', 'cache/')
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'python')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_MAX_AGE = 60 * 60 * 24
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -138,11 +176,91 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGINATOR_COUNT = 10
+# наибольший ?limit= страницы JSON API
+API_MAX_LIMIT = 100
+# комментарии на странице поста, дальше - подгрузка по курсору
+COMMENTS_PAGE_SIZE = 20
+# 'pages' - нумерованные страницы, 'cursor' - курсорная пагинация
+PAGINATOR_MODE = 'pages'
+# число записей ленты кэшируется вместе с её поколением
+PAGINATOR_COUNT_TIMEOUT = 60 * 60
+
+# авторы с большим числом подписчиков не раскладываются по лентам,
+# их посты подмешиваются в ленту подписок при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_CELEBRITIES_TIMEOUT = 300
+TIMELINE_BATCH_SIZE = 500
+# подписки читателя в кэше; сбрасываются сигналами Follow
+FOLLOW_GRAPH_TIMEOUT = 60 * 60
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# загруженные картинки: предел точек проверяется до декодирования,
+# длинная сторона уменьшается до IMAGE_MAX_SIDE; для ленты пишутся
+# варианты IMAGE_VARIANT_WIDTHS (WebP, если Pillow умеет, иначе JPEG)
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_SIDE = 2560
+IMAGE_QUALITY = 82
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_VARIANT_FORMAT = 'WEBP'
+
+# миниатюры создаются при загрузке; одну недостающую миниатюру
+# генерирует один запрос, остальные ждут его под блокировкой
+THUMBNAIL_BACKEND = 'posts.thumbnails.LockingThumbnailBackend'
+THUMBNAIL_LOCK_TIMEOUT = 30
+THUMBNAIL_LOCK_POLL = 0.1
+# метаданные миниатюр дополнительно хранятся в LRU процесса
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_LOCAL_SIZE = 5000
+THUMBNAIL_LOCAL_TIMEOUT = 300
+
+# фрагменты лент сбрасываются сигналами, время жизни - страховка
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# сессии читаются из кэша и пишутся в базу, пользователь запроса
+# кэшируется users.middleware; запись сбрасывают сигналы User
+# и выход, время жизни ограничивает изменения в обход save()
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTH_USER_CACHE_TIMEOUT = 300
+
+# замеры запроса: заголовок Server-Timing и строка лога
+# yatube.requests; запросы дольше SLOW_REQUEST_MS пишутся всегда,
+# остальные - при REQUEST_LOG_LEVEL=INFO
+SERVER_TIMING_HEADER = True
+SLOW_REQUEST_MS = 500
+
+# профилировщик запросов: сотрудник включает его заголовком
+# X-Profile или параметром ?__profile, кроме того, профилируется
+# случайная доля PROFILER_SAMPLE_RATE всех запросов
+PROFILER_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILER_INTERVAL = 0.002
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# общий для всех процессов сервера кэш в файле SQLite (WAL)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,
+        },
     }
 }